@@ -0,0 +1,268 @@
+"""Created on Sun October 18 23:10:00 2026.
+
+Benchmarks da camada de persistência do QScraper.
+
+Os dados utilizados são os exports do MongoDB arquivados no repositório
+(CEDERJ_2022_LEANDRO_RAFAEL-main.zip), no formato {coleção: [documentos]}.
+Cada benchmark escreve em um banco temporário, apagado ao final.
+
+Exemplos:
+    python Benchmark.py rawbson --uri mongodb://localhost:27017/
+    python Benchmark.py layouts --uri mongodb://localhost:27017/
+"""
+
+import argparse
+import json
+import os
+import time
+import zipfile
+
+import bson
+
+from collections import defaultdict
+from pymongo import MongoClient
+from QStorage import BulkWriter
+from QStorage import Storage
+
+DEFAULT_DATASET = "CEDERJ_2022_LEANDRO_RAFAEL-main.zip"
+SCRATCH_DATABASE = "quora_benchmark"
+
+
+def load_collection(dataset: str, name: str) -> list:
+    """
+    Lê uma coleção exportada, de um arquivo .zip ou de uma pasta.
+
+    Parameters
+    ----------
+    dataset : str
+        Caminho para o .zip arquivado ou para a pasta com os JSONs.
+    name : str
+        Nome da coleção, por exemplo "answers".
+
+    Raises
+    ------
+    FileNotFoundError
+        Erro caso a coleção não exista no dataset.
+
+    Returns
+    -------
+    list
+        Documentos da coleção.
+
+    """
+    filename = f"{name}.json"
+    if zipfile.is_zipfile(dataset):
+        with zipfile.ZipFile(dataset) as z:
+            members = [m for m in z.namelist()
+                       if os.path.basename(m) == filename]
+            if not members:
+                raise FileNotFoundError(f"{filename} não está em {dataset}.")
+            with z.open(members[0]) as f:
+                return json.load(f)[name]
+
+    with open(os.path.join(dataset, filename)) as f:
+        return json.load(f)[name]
+
+
+def _timed(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_raw_bson(client: MongoClient, dataset: str, repeat=3,
+                   batch_size=500, processes=None):
+    """
+    Compara inserções em lote de dicts com inserções de RawBSONDocument.
+
+    Parameters
+    ----------
+    client : MongoClient
+        Cliente do MongoDB.
+    dataset : str
+        Caminho para o dataset arquivado.
+    repeat : int, optional
+        Repetições de cada cenário; é reportado o melhor tempo. The default
+        is 3.
+    batch_size : int, optional
+        Tamanho do lote do BulkWriter. The default is 500.
+    processes : int, optional
+        Processos do pool de codificação. The default is None, que usa
+        os.cpu_count().
+
+    Returns
+    -------
+    dict
+        Tempo, em segundos, de cada cenário.
+
+    """
+    answers = load_collection(dataset, "answers")
+    processes = processes or os.cpu_count()
+    db = client[SCRATCH_DATABASE]
+
+    def encode():
+        for answer in answers:
+            bson.encode(answer)
+
+    def insert(**options):
+        def run():
+            db["answers"].drop()
+            writer = BulkWriter(db, batch_size=batch_size, **options)
+            for answer in answers:
+                writer.insert("answers", answer)
+            writer.close()
+        return run
+
+    results = {
+        "bson.encode (sem inserção)": _timed(encode, repeat),
+        "dict": _timed(insert(), repeat),
+        "raw_bson": _timed(insert(raw_bson=True), repeat),
+        f"raw_bson + {processes} processos": _timed(
+            insert(raw_bson=True, encoder_processes=processes), repeat),
+    }
+    client.drop_database(SCRATCH_DATABASE)
+
+    print(f"{len(answers)} answers, extensão C do bson: {bson.has_c()}")
+    for scenario, seconds in results.items():
+        print(f"{scenario:<32} {seconds:8.3f} s "
+              f"{len(answers) / seconds:10.0f} docs/s")
+    return results
+
+
+def _load_layout(db, dataset, layout):
+    """Grava o dataset arquivado em db usando o relation_layout dado."""
+    category_query = load_collection(dataset, "category_query")
+    names = {cq["_id"]: (cq["category"], cq["query"])
+             for cq in category_query}
+    questions = {q["_id"]: q for q in load_collection(dataset, "questions")}
+    answers = {a["_id"]: a for a in load_collection(dataset, "answers")}
+
+    storage = Storage(db, relation_layout=layout)
+    for cq in category_query:
+        storage.writer.insert("category_query", cq)
+    for relation in load_collection(dataset, "category_query_qid"):
+        if relation["qid"] in questions:
+            category, query = names[relation["category_query"]]
+            storage.add_question(category, query,
+                                 dict(questions[relation["qid"]]))
+
+    page = defaultdict(list)
+    for relation in load_collection(dataset, "question_answer"):
+        if relation["aid"] in answers:
+            page[relation["qid"]].append(dict(answers[relation["aid"]]))
+    for qid, items in page.items():
+        storage.add_answers(qid, items)
+    storage.close()
+
+    if layout == "collections":
+        # índices equivalentes ao multikey do layout embedded
+        db["category_query_qid"].create_index("category_query")
+        db["question_answer"].create_index("qid")
+
+
+def _index_size(db):
+    return sum(db.command("collStats", name)["totalIndexSize"]
+               for name in db.list_collection_names())
+
+
+def _traverse_collections(db, category):
+    """category -> question -> answer com duas junções $lookup."""
+    return list(db["category_query"].aggregate([
+        {"$match": {"category": category}},
+        {"$lookup": {"from": "category_query_qid", "localField": "_id",
+                     "foreignField": "category_query", "as": "relation"}},
+        {"$unwind": "$relation"},
+        {"$group": {"_id": "$relation.qid"}},
+        {"$lookup": {"from": "question_answer", "localField": "_id",
+                     "foreignField": "qid", "as": "question_answer"}},
+        {"$unwind": "$question_answer"},
+        {"$lookup": {"from": "answers", "localField": "question_answer.aid",
+                     "foreignField": "_id", "as": "answer"}},
+        {"$unwind": "$answer"},
+    ]))
+
+
+def _traverse_embedded(db, category):
+    """category -> question -> answer pelos arrays embutidos."""
+    ids = [cq["_id"] for cq in db["category_query"].find(
+        {"category": category}, {"_id": 1})]
+    return list(db["questions"].aggregate([
+        {"$match": {"category_query": {"$in": ids}}},
+        {"$project": {"aids": 1}},
+        {"$lookup": {"from": "answers", "localField": "aids",
+                     "foreignField": "_id", "as": "answer"}},
+        {"$unwind": "$answer"},
+    ]))
+
+
+def bench_relation_layouts(client: MongoClient, dataset: str, repeat=3):
+    """
+    Compara os layouts de relação "collections" e "embedded".
+
+    Para cada layout o dataset arquivado é gravado em um banco temporário e
+    são medidos o tamanho total dos índices e a latência da travessia
+    category -> question -> answer de todas as categorias.
+
+    Parameters
+    ----------
+    client : MongoClient
+        Cliente do MongoDB.
+    dataset : str
+        Caminho para o dataset arquivado.
+    repeat : int, optional
+        Repetições da travessia; é reportado o melhor tempo. The default
+        is 3.
+
+    Returns
+    -------
+    dict
+        Para cada layout: tamanho dos índices (bytes), latência (segundos)
+        e quantidade de pares question-answer percorridos.
+
+    """
+    categories = {cq["category"]
+                  for cq in load_collection(dataset, "category_query")}
+    traversals = {"collections": _traverse_collections,
+                  "embedded": _traverse_embedded}
+
+    results = dict()
+    for layout, traverse in traversals.items():
+        name = f"{SCRATCH_DATABASE}_{layout}"
+        client.drop_database(name)
+        db = client[name]
+        _load_layout(db, dataset, layout)
+
+        rows = sum(len(traverse(db, c)) for c in categories)
+        seconds = _timed(lambda: [traverse(db, c) for c in categories],
+                         repeat)
+        results[layout] = {"index_size": _index_size(db),
+                           "latency": seconds,
+                           "rows": rows}
+        client.drop_database(name)
+
+    print(f"{'layout':<12} {'índices (KiB)':>14} {'travessia (ms)':>15} "
+          f"{'pares q-a':>10}")
+    for layout, r in results.items():
+        print(f"{layout:<12} {r['index_size'] / 1024:14.1f} "
+              f"{r['latency'] * 1000:15.1f} {r['rows']:10d}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument("benchmark", choices=["rawbson", "layouts"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    _client = MongoClient(args.uri)
+    if args.benchmark == "rawbson":
+        bench_raw_bson(_client, args.dataset, repeat=args.repeat,
+                       processes=args.processes)
+    elif args.benchmark == "layouts":
+        bench_relation_layouts(_client, args.dataset, repeat=args.repeat)
@@ -0,0 +1,148 @@
+"""Created on Mon October 19 00:20:00 2026.
+
+Conversão das coleções de relação de um banco existente para outro esquema
+de chaves (QStorage.RelationKeys).
+
+Cada coleção é lida em lotes por um cursor, convertida para uma coleção
+auxiliar e, ao final, trocada pela original com renameCollection. A coleção
+original é mantida com o sufixo "_bak" até que a troca termine.
+
+Exemplo:
+    python Migrate.py --database quora_database --scheme int64
+"""
+
+import argparse
+
+from pymongo import MongoClient
+from QStorage import CATEGORY_QUERY_RELATIONS
+from QStorage import RELATION_COLLECTIONS
+from QStorage import BulkWriter
+from QStorage import Namespace
+from QStorage import RelationKeys
+from tqdm import tqdm
+
+
+def _current_scheme(db) -> str:
+    doc = db["metadata"].find_one({"_id": "relation_keys"})
+    return doc["scheme"] if doc is not None else "string"
+
+
+def migrate_relation_keys(client: MongoClient, database: str, scheme: str,
+                          batch_size=1000, keep_backup=False,
+                          prefix: str = "") -> dict:
+    """
+    Converte as coleções de relação de database para o esquema scheme.
+
+    Parameters
+    ----------
+    client : MongoClient
+        Cliente do MongoDB.
+    database : str
+        Nome do banco a ser convertido.
+    scheme : str
+        Esquema de destino: "string", "compound" ou "int64".
+    batch_size : int, optional
+        Documentos lidos e gravados por lote. The default is 1000.
+    keep_backup : bool, optional
+        Mantém as coleções originais com o sufixo "_bak". The default is
+        False. O backup também é mantido quando alguma relação não pôde ser
+        convertida.
+    prefix : str, optional
+        Prefixo das coleções da execução (ver QStorage.Namespace). The
+        default is "".
+
+    Raises
+    ------
+    ValueError
+        Erro caso o scheme seja definido fora dos padrões.
+
+    Returns
+    -------
+    dict
+        Quantidade de documentos convertidos e ignorados por coleção.
+
+    """
+    db = Namespace(client, database, prefix)
+    keys = RelationKeys(db, scheme)
+    source = _current_scheme(db)
+    if source == scheme:
+        print(f"{database} já usa relation_keys={scheme!r}.")
+        return dict()
+
+    # pares category-query do esquema string, a partir da coleção
+    # category_query (o _id em string é ambíguo quando há "_")
+    names = {cq["_id"]: (cq["category"], cq["query"])
+             for cq in db["category_query"].find({}, {"category": 1,
+                                                      "query": 1})}
+
+    if source != "string":
+        iids = {kind: {doc["iid"]: doc["_id"]
+                       for doc in db[kind].find({"iid": {"$exists": True}},
+                                                {"iid": 1})}
+                for kind in ("category", "query")}
+
+    def category_query(relation):
+        if source == "string":
+            return names.get(relation["category_query"])
+        category = iids["category"].get(relation["category"])
+        query = iids["query"].get(relation["query"])
+        if category is None or query is None:
+            return None
+        return category, query
+
+    report = dict()
+    for name in RELATION_COLLECTIONS:
+        target = f"{name}_migrating"
+        db[target].drop()
+        writer = BulkWriter(db, batch_size=batch_size)
+        converted = skipped = 0
+
+        cursor = db[name].find({}, batch_size=batch_size)
+        total = db[name].estimated_document_count()
+        for relation in tqdm(cursor, total=total, desc=f"Migrando {name}"):
+            if name == "question_answer":
+                doc = keys.question_answer(relation["qid"], relation["aid"])
+            else:
+                field = CATEGORY_QUERY_RELATIONS[name][0]
+                pair = category_query(relation)
+                if pair is None:
+                    skipped += 1
+                    continue
+                doc = keys.category_query_entity(*pair, field,
+                                                 relation[field])
+            writer.insert(target, doc)
+            converted += 1
+        writer.close()
+
+        if converted:
+            db[name].rename(db[f"{name}_bak"].name, dropTarget=True)
+            db[target].rename(db[name].name)
+            # relações sem category_query conhecida ficam apenas no backup
+            if not keep_backup and not skipped:
+                db[f"{name}_bak"].drop()
+        report[name] = {"converted": converted, "skipped": skipped}
+
+    db["metadata"].update_one({"_id": "relation_keys"},
+                              {"$set": {"scheme": scheme}}, upsert=True)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Converte as chaves das coleções de relação.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--database", default="quora_database")
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--scheme", required=True,
+                        choices=RelationKeys.schemes)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--keep-backup", action="store_true")
+    args = parser.parse_args()
+
+    result = migrate_relation_keys(MongoClient(args.uri), args.database,
+                                   args.scheme, batch_size=args.batch_size,
+                                   keep_backup=args.keep_backup,
+                                   prefix=args.prefix)
+    for collection, counts in result.items():
+        print(f"{collection}: {counts['converted']} convertidos, "
+              f"{counts['skipped']} ignorados")
@@ -0,0 +1,435 @@
+"""Created on Mon October 19 08:00:00 2026.
+
+Arquivo das respostas brutas do GraphQL do QScraper.
+
+Com ARCHIVE_DIR definido nas settings, o ArchiveMiddleware grava cada
+resposta aceita pelo QControl (classificada como ok) em segmentos somente de
+acréscimo: cada registro é um JSON comprimido com zlib, precedido do seu
+tamanho em 4 bytes, com o corpo da resposta, a operação (queryName), as
+variables, o callback e os cb_kwargs da requisição e, nas buscas, todas as
+categories da query (SearchSpider._fanout). As replicações dos resultados de
+uma query para uma nova category (sinal category_fanout) também são gravadas,
+como registros de operação "fanout". Ao lado de cada segmento (NNNNNN.seg)
+fica o seu índice (NNNNNN.idx), uma linha JSON por registro com o
+fingerprint da operação e das variables e a posição do registro.
+
+O reprocess reexecuta o parse das spiders sobre os registros arquivados, sem
+rede, em um banco novo; os segmentos são distribuídos entre processos e os
+registros de cada segmento são lidos na ordem em que foram gravados. As
+replicações ("fanout") são aplicadas depois de todos os segmentos, na ordem
+do arquivo, pois a category de origem pode ter sido gravada em um segmento
+anterior, por exemplo na coleta que tornou a query válida (fresh_ttl).
+
+Exemplo:
+    python QArchive.py --archive etc/archive --database quora_reprocess
+        --params etc/requests_params_answers.json --processes 4
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+
+from concurrent.futures import ProcessPoolExecutor
+from QStorage import Namespace
+from QStorage import Storage
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+# Cabeçalho de cada registro: tamanho do registro comprimido
+FRAME = struct.Struct(">I")
+
+# Sinal enviado pela SearchSpider ao replicar os resultados de uma query
+# para uma nova category, com os argumentos spider, query, source e category
+category_fanout = object()
+
+
+def request_key(body) -> tuple:
+    """(queryName, variables) do payload de uma requisição GraphQL."""
+    try:
+        payload = json.loads(body)
+    except (TypeError, ValueError):
+        return None, None
+    if not isinstance(payload, dict):
+        return None, None
+    return payload.get("queryName"), payload.get("variables") or {}
+
+
+def fingerprint(operation: str, variables: dict) -> str:
+    """
+    Fingerprint canônico de uma operação GraphQL.
+
+    As variables são serializadas com as chaves ordenadas, de modo que
+    payloads equivalentes têm o mesmo fingerprint.
+    """
+    canonical = json.dumps([operation, variables], sort_keys=True,
+                           separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class ArchiveWriter:
+    """Escritor de segmentos de respostas, somente de acréscimo."""
+
+    def __init__(self, directory: str, segment_size: int = 256 * 2 ** 20):
+        """
+        Escritor de segmentos do arquivo de respostas.
+
+        Cada escritor abre um segmento novo, numerado após os já existentes;
+        os segmentos anteriores nunca são alterados.
+
+        Parameters
+        ----------
+        directory : str
+            Pasta do arquivo.
+        segment_size : int, optional
+            Tamanho, em bytes, a partir do qual um novo segmento é aberto.
+            The default is 256 MB.
+
+        Returns
+        -------
+        None.
+
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self._segment = None
+        self._index = None
+        self.records = 0
+
+    def _open(self):
+        numbers = [int(os.path.basename(path)[:-4]) for path in glob.glob(
+            os.path.join(self.directory, "*.seg"))]
+        number = max(numbers, default=0) + 1
+        name = os.path.join(self.directory, f"{number:06d}")
+        self._segment = open(f"{name}.seg", "ab")
+        self._index = open(f"{name}.idx", "a", encoding="utf-8")
+
+    def append(self, record: dict):
+        """Grava um registro e a sua linha no índice."""
+        if self._segment is None or self._segment.tell() >= self.segment_size:
+            self.close()
+            self._open()
+        data = zlib.compress(json.dumps(record, ensure_ascii=False).encode())
+        offset = self._segment.tell()
+        self._segment.write(FRAME.pack(len(data)) + data)
+        self._index.write(json.dumps(
+            {"fp": fingerprint(record["operation"], record["variables"]),
+             "operation": record["operation"], "offset": offset,
+             "size": len(data) + FRAME.size}) + "\n")
+        self.records += 1
+
+    def flush(self):
+        """Envia ao disco os registros gravados."""
+        if self._segment is not None:
+            self._segment.flush()
+            self._index.flush()
+
+    def close(self):
+        """Fecha o segmento atual."""
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
+
+
+def read_segment(path: str):
+    """
+    Registros de um segmento, na ordem em que foram gravados.
+
+    Um registro incompleto no fim do segmento (coleta interrompida durante
+    a escrita) é ignorado.
+    """
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(FRAME.size)
+            if len(header) < FRAME.size:
+                return
+            data = f.read(FRAME.unpack(header)[0])
+            try:
+                yield json.loads(zlib.decompress(data))
+            except zlib.error:
+                return
+
+
+class ArchiveReader:
+    """Leitura dos registros do arquivo pelo índice."""
+
+    def __init__(self, directory: str):
+        """
+        Leitor do arquivo de respostas.
+
+        Parameters
+        ----------
+        directory : str
+            Pasta do arquivo.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.directory = directory
+        self.segments = sorted(glob.glob(os.path.join(directory, "*.seg")))
+        # fingerprint: (segmento, posição, tamanho) do registro mais recente
+        self._index = dict()
+        for segment in self.segments:
+            with open(segment[:-4] + ".idx", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._index[entry["fp"]] = (segment, entry["offset"],
+                                                entry["size"])
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, operation: str, variables: dict) -> dict:
+        """Registro mais recente da operação com as variables; ou None."""
+        entry = self._index.get(fingerprint(operation, variables))
+        if entry is None:
+            return None
+        segment, offset, size = entry
+        with open(segment, "rb") as f:
+            f.seek(offset)
+            data = f.read(size)
+        return json.loads(zlib.decompress(data[FRAME.size:]))
+
+
+class ArchiveMiddleware:
+    """Middleware de download que arquiva as respostas aceitas."""
+
+    def __init__(self, writer: ArchiveWriter):
+        self.writer = writer
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        directory = crawler.settings.get("ARCHIVE_DIR")
+        if not directory:
+            raise NotConfigured
+        mw = cls(ArchiveWriter(directory, crawler.settings.getint(
+            "ARCHIVE_SEGMENT_SIZE", 256 * 2 ** 20)))
+        crawler.signals.connect(mw.spider_closed, signals.spider_closed)
+        crawler.signals.connect(mw.fanout, category_fanout)
+        return mw
+
+    def fanout(self, spider, query, source, category):
+        """Arquiva a replicação dos resultados da query para a category."""
+        self.writer.append({"spider": spider.name,
+                            "operation": "fanout",
+                            "variables": {"query": query, "source": source,
+                                          "category": category},
+                            "t": time.time()})
+
+    def process_response(self, request, response, spider):
+        """Arquiva a resposta com o callback e os cb_kwargs da requisição."""
+        operation, variables = request_key(request.body)
+        if operation is None or not hasattr(response, "text") or (
+                "cached" in response.flags):
+            return response
+        callback = getattr(request.callback, "__name__", "parse")
+        record = {"spider": spider.name,
+                  "operation": operation,
+                  "variables": variables,
+                  "url": request.url,
+                  "body": request.body.decode(),
+                  "callback": callback,
+                  "cb_kwargs": request.cb_kwargs,
+                  "status": response.status,
+                  "response": response.text,
+                  "t": time.time()}
+        # categories para as quais os resultados da query são replicados
+        categories = getattr(spider, "_fanout", {}).get(
+            request.cb_kwargs.get("query"))
+        if categories:
+            record["categories"] = list(categories)
+        self.writer.append(record)
+        spider.crawler.stats.inc_value("archive/records")
+        return response
+
+    def spider_closed(self, spider):
+        self.writer.close()
+
+
+def _replay_fanout(spider, query: str, categories: list):
+    """
+    Registra na SearchSpider reprocessada as categories de uma query.
+
+    As categories inéditas entram no banco (category e category_query) e no
+    _fanout da spider, que replica para elas os resultados das páginas
+    seguintes; as que surgiram depois das páginas já reprocessadas recebem
+    os resultados gravados, como na coleta.
+    """
+    known = spider._fanout.setdefault(query, [])
+    new = [category for category in categories if category not in known]
+    if not new:
+        return
+    spider._storage.add_category_queries([(category, query)
+                                          for category in new])
+    if known:
+        for category in new:
+            spider._storage.copy_category_query(known[0], category, query)
+    known.extend(new)
+
+
+def _replay_segment(path: str, uri: str, requests_params: dict,
+                    database: str, prefix: str,
+                    storage_options: dict) -> tuple:
+    """
+    Reexecuta o parse dos registros de um segmento; roda em um processo.
+
+    Returns
+    -------
+    tuple
+        (quantidade de registros reprocessados por spider, variables dos
+        registros "fanout" do segmento, na ordem do arquivo).
+
+    """
+    from pymongo import MongoClient
+    from scrapy.crawler import Crawler
+    from scrapy.http import JsonRequest
+    from scrapy.http import TextResponse
+
+    import QScraper
+
+    classes = {cls.name: cls for cls in (
+        QScraper.SearchSpider, QScraper.AnswerSpider, QScraper.TopicSpider,
+        QScraper.PostSpider, QScraper.ProfileSpider, QScraper.CommentSpider,
+        QScraper.RelatedSpider)}
+    client = MongoClient(uri)
+    spiders = dict()
+    counts = dict()
+    fanouts = []
+    for record in read_segment(path):
+        name = record["spider"]
+        if name not in spiders:
+            cls = classes[name]
+            args = ({},) if cls is QScraper.SearchSpider else ()
+            options = dict(client=client, storage_options=storage_options,
+                           database=database, prefix=prefix)
+            if cls is QScraper.SearchSpider:
+                options["resume"] = True
+            crawler = Crawler(cls)
+            spider = cls.from_crawler(crawler, *args, dict(requests_params),
+                                      **options)
+            crawler.spider = spider
+            crawler.stats.open_spider(spider)
+            spiders[name] = spider
+        spider = spiders[name]
+
+        if record["operation"] == "fanout":
+            # aplicada pelo reprocess depois de todos os segmentos
+            fanouts.append(record["variables"])
+            continue
+
+        request = JsonRequest(record["url"],
+                              body=record["body"].encode(),
+                              cb_kwargs=record["cb_kwargs"])
+        response = TextResponse(record["url"], status=record["status"],
+                                body=record["response"].encode(),
+                                encoding="utf-8", request=request)
+        kwargs = record["cb_kwargs"]
+        if name == QScraper.SearchSpider.name:
+            _replay_fanout(spider, kwargs["query"], record.get(
+                "categories") or [kwargs["category"]])
+        # as requisições seguintes também estão no arquivo: são descartadas
+        for _ in getattr(spider, record["callback"])(response,
+                                                     **kwargs) or ():
+            pass
+        counts[name] = counts.get(name, 0) + 1
+
+    for spider in spiders.values():
+        spider._storage.close(spider.crawler.stats)
+    client.close()
+    return counts, fanouts
+
+
+def _replay_fanouts(fanouts: list, uri: str, database: str, prefix: str,
+                    storage_options: dict):
+    """Aplica as replicações arquivadas, na ordem do arquivo."""
+    from pymongo import MongoClient
+
+    client = MongoClient(uri)
+    storage = Storage(Namespace(client, database, prefix),
+                      **(storage_options or {}))
+    for variables in fanouts:
+        storage.add_category_queries([(variables["category"],
+                                       variables["query"])])
+        storage.copy_category_query(variables["source"],
+                                    variables["category"], variables["query"])
+    storage.close()
+    client.close()
+
+
+def reprocess(directory: str, uri: str, requests_params: dict,
+              database: str, prefix: str = "", processes: int = None,
+              storage_options: dict = None) -> dict:
+    """
+    Reexecuta o parse das spiders sobre o arquivo de respostas.
+
+    Parameters
+    ----------
+    directory : str
+        Pasta do arquivo.
+    uri : str
+        URI do MongoDB; cada processo abre o seu cliente.
+    requests_params : dict
+        Parâmetros de coleta de dados, usados na construção das spiders.
+    database : str
+        Banco de dados de destino, de preferência novo.
+    prefix : str, optional
+        Prefixo das coleções de destino (ver QStorage.Namespace). The
+        default is "".
+    processes : int, optional
+        Processos de reprocessamento. The default is None, um por CPU.
+    storage_options : dict, optional
+        Opções da camada de persistência (QStorage.Storage). The default is
+        None.
+
+    Returns
+    -------
+    dict
+        Quantidade de registros reprocessados por spider.
+
+    """
+    segments = sorted(glob.glob(os.path.join(directory, "*.seg")))
+    totals = dict()
+    fanouts = []
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(_replay_segment, segment, uri,
+                               requests_params, database, prefix,
+                               storage_options)
+                   for segment in segments]
+        for future in futures:
+            counts, segment_fanouts = future.result()
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+            fanouts.extend(segment_fanouts)
+    _replay_fanouts(fanouts, uri, database, prefix, storage_options)
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reprocessa o arquivo de respostas em um banco novo.")
+    parser.add_argument("--archive", required=True)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--database", required=True)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--params", required=True)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.params) as f:
+        params = json.loads(f.read())
+    params["user-agent"] = {}
+    result = reprocess(args.archive, args.uri, params, args.database,
+                       args.prefix, args.processes)
+    for spider, count in result.items():
+        print(f"{spider}: {count} respostas reprocessadas")
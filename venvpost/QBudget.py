@@ -0,0 +1,166 @@
+"""Created on Mon October 19 03:40:00 2026.
+
+Orçamentos de coleta do QScraper.
+
+Um CrawlBudget é compartilhado pelas spiders de uma execução e limita a
+quantidade total de requisições e de páginas, o tempo de relógio da execução
+e a quantidade de páginas de cada query, pergunta, tópico e thread de
+comentários. Esgotado um
+orçamento, as spiders deixam de gerar requisições, as que já estão em curso
+terminam normalmente e os cursores das paginações interrompidas são gravados
+no banco para uma próxima execução.
+"""
+
+import time
+
+from collections import Counter
+
+
+class CrawlBudget:
+    """Orçamento de requisições, páginas e tempo de uma execução."""
+
+    def __init__(self, max_requests: int = None, max_pages: int = None,
+                 deadline: float = None, query_pages: int = None,
+                 question_pages: int = None, topic_pages: int = None,
+                 comment_pages: int = None):
+        """
+        Orçamento compartilhado pelas spiders de uma execução.
+
+        Parameters
+        ----------
+        max_requests : int, optional
+            Quantidade máxima de requisições da execução. The default is
+            None, sem limite.
+        max_pages : int, optional
+            Quantidade máxima de páginas analisadas na execução. The default
+            is None, sem limite.
+        deadline : float, optional
+            Tempo máximo, em segundos, contado a partir da criação do
+            orçamento. The default is None, sem limite.
+        query_pages : int, optional
+            Páginas de busca por query. The default is None, sem limite.
+        question_pages : int, optional
+            Páginas de respostas por pergunta. The default is None, sem
+            limite.
+        topic_pages : int, optional
+            Páginas do feed por tópico. The default is None, sem limite.
+        comment_pages : int, optional
+            Páginas de comentários por answer ou question. The default is
+            None, sem limite.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.max_requests = max_requests
+        self.max_pages = max_pages
+        self.deadline = None
+        if deadline is not None:
+            self.deadline = time.monotonic() + deadline
+        self.item_pages = {"search": query_pages, "answer": question_pages,
+                           "topic": topic_pages, "comment": comment_pages}
+
+        self.requests = 0
+        self.pages = 0
+        # motivo do esgotamento do orçamento global
+        self.reason = None
+        # paginações interrompidas e itens não iniciados, por tipo
+        self.unfinished = Counter()
+
+    def exhausted(self) -> str:
+        """
+        Motivo do esgotamento do orçamento global.
+
+        Returns
+        -------
+        str
+            "deadline", "max_requests", "max_pages" ou o motivo do stop;
+            None enquanto houver orçamento.
+
+        """
+        if self.reason is None:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.reason = "deadline"
+            elif (self.max_requests is not None
+                  and self.requests >= self.max_requests):
+                self.reason = "max_requests"
+            elif self.max_pages is not None and self.pages >= self.max_pages:
+                self.reason = "max_pages"
+        return self.reason
+
+    def remaining(self) -> float:
+        """Segundos até o deadline; None se não houver deadline."""
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time.monotonic())
+
+    def request(self, kind: str, pages: int = 0) -> bool:
+        """
+        Autoriza e contabiliza uma nova requisição.
+
+        Parameters
+        ----------
+        kind : str
+            "search" para páginas de busca, "answer" para páginas de
+            respostas, "topic" para páginas do feed de tópicos ou "comment"
+            para páginas de comentários.
+        pages : int, optional
+            Páginas já coletadas da query, da pergunta, do tópico ou da
+            thread. The default is 0.
+
+        Returns
+        -------
+        bool
+            False se o orçamento do item ou o global estiver esgotado.
+
+        """
+        limit = self.item_pages.get(kind)
+        if limit is not None and pages >= limit:
+            return False
+        if self.exhausted():
+            return False
+        self.requests += 1
+        return True
+
+    def stop(self, reason: str = "stopped"):
+        """Esgota o orçamento global (parada pelo canal de controle)."""
+        if self.exhausted() is None:
+            self.reason = reason
+
+    def page(self):
+        """Contabiliza uma página analisada."""
+        self.pages += 1
+
+    def report(self) -> dict:
+        """Consumo do orçamento e itens que ficaram por coletar."""
+        return {"reason": self.reason,
+                "requests": self.requests,
+                "pages": self.pages,
+                "unfinished": dict(self.unfinished)}
+
+    def finish(self, kind: str, unfinished: int, stats=None):
+        """
+        Registra os itens que ficaram por coletar ao fim de uma spider.
+
+        Parameters
+        ----------
+        kind : str
+            Tipo dos itens, por exemplo "queries" ou "questions".
+        unfinished : int
+            Quantidade de itens com coleta pendente.
+        stats : StatsCollector, optional
+            Coletor de estatísticas do Scrapy, que recebe o consumo do
+            orçamento com o prefixo "budget/". The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.unfinished[kind] = unfinished
+        if stats is not None:
+            stats.set_value("budget/reason", self.exhausted())
+            stats.set_value("budget/requests", self.requests)
+            stats.set_value("budget/pages", self.pages)
+            stats.set_value(f"budget/unfinished_{kind}", unfinished)
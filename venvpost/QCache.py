@@ -0,0 +1,123 @@
+"""Created on Mon October 19 09:10:00 2026.
+
+Cache HTTP das requisições GraphQL do QScraper.
+
+As requisições ao GraphQL do Quora são POSTs para a mesma url que diferem
+apenas no payload JSON, para as quais a política RFC2616 do HttpCacheMiddleware
+não serve. A GraphQLCachePolicy guarda somente as respostas classificadas como
+ok pelo QControl e a GraphQLCacheStorage as indexa pelo fingerprint canônico
+de (queryName, variables) do QArchive, independente da sessão e da ordem das
+chaves do payload, em um banco dbm por spider em HTTPCACHE_DIR.
+
+Cada operação tem a sua validade, em segundos: HTTPCACHE_OPERATION_TTL
+atualiza o OPERATION_TTL; as demais usam HTTPCACHE_EXPIRATION_SECS (0 para
+nunca expirar).
+
+As spiders definem a política e o armazenamento em custom_settings
+(HTTPCACHE_SETTINGS); o cache é ligado com HTTPCACHE_ENABLED, por exemplo
+pelo http_cache do QScrapeRunner. As requisições com meta "dont_cache", como
+as revisitas da AnswerSpider e as sondagens da SearchSpider, vão sempre à
+rede.
+"""
+
+import dbm
+import os
+import pickle
+import time
+
+from QArchive import fingerprint
+from QArchive import request_key
+from QControl import classify
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+# Política e armazenamento do HttpCacheMiddleware das spiders
+HTTPCACHE_SETTINGS = {
+    'HTTPCACHE_POLICY': 'QCache.GraphQLCachePolicy',
+    'HTTPCACHE_STORAGE': 'QCache.GraphQLCacheStorage',
+}
+
+# Validade padrão, em segundos, das respostas de cada operação: páginas de
+# busca mudam rápido; páginas de respostas, devagar
+OPERATION_TTL = {
+    "SearchResultsListQuery": 6 * 3600,
+    "QuestionAnswerPagedListQuery": 7 * 86400,
+}
+
+
+class GraphQLCachePolicy:
+    """Política de cache das requisições GraphQL."""
+
+    def __init__(self, settings):
+        self.ignore_http_codes = [
+            int(code) for code in settings.getlist(
+                'HTTPCACHE_IGNORE_HTTP_CODES')]
+
+    def should_cache_request(self, request) -> bool:
+        """Somente requisições com queryName no payload."""
+        return request_key(request.body)[0] is not None
+
+    def should_cache_response(self, response, request) -> bool:
+        """Somente respostas classificadas como ok pelo QControl."""
+        if response.status in self.ignore_http_codes:
+            return False
+        return classify(response)[0] == "ok"
+
+    def is_cached_response_fresh(self, cachedresponse, request) -> bool:
+        # a validade é verificada pela GraphQLCacheStorage
+        return True
+
+    def is_cached_response_valid(self, cachedresponse, response,
+                                 request) -> bool:
+        return False
+
+
+class GraphQLCacheStorage:
+    """Armazenamento dbm das respostas, pelo fingerprint da operação."""
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.ttl = dict(OPERATION_TTL,
+                        **settings.getdict('HTTPCACHE_OPERATION_TTL'))
+        self.db = None
+
+    def open_spider(self, spider):
+        dbpath = os.path.join(self.cachedir, f"{spider.name}.graphql.db")
+        self.db = dbm.open(dbpath, "c")
+        spider.logger.debug(f"Cache GraphQL em {dbpath}.")
+
+    def close_spider(self, spider):
+        self.db.close()
+
+    def _key(self, request):
+        operation, variables = request_key(request.body)
+        return operation, fingerprint(operation, variables)
+
+    def retrieve_response(self, spider, request):
+        """Resposta guardada e dentro da validade da operação; ou None."""
+        operation, key = self._key(request)
+        data = self.db.get(key)
+        if data is None:
+            return None
+        data = pickle.loads(data)
+        ttl = self.ttl.get(operation, self.expiration_secs)
+        if 0 < ttl < time.time() - data["time"]:
+            spider.crawler.stats.inc_value("httpcache/expired")
+            return None
+
+        headers = Headers(data["headers"])
+        respcls = responsetypes.from_args(headers=headers, url=data["url"],
+                                          body=data["body"])
+        return respcls(url=data["url"], headers=headers,
+                       status=data["status"], body=data["body"])
+
+    def store_response(self, spider, request, response):
+        """Guarda a resposta, substituindo a anterior da operação."""
+        _, key = self._key(request)
+        self.db[key] = pickle.dumps({"status": response.status,
+                                     "url": response.url,
+                                     "headers": dict(response.headers),
+                                     "body": response.body,
+                                     "time": time.time()}, protocol=4)
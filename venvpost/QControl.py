@@ -0,0 +1,709 @@
+"""Created on Mon October 19 06:20:00 2026.
+
+Controle das requisições GraphQL do QScraper.
+
+O GraphQLErrorMiddleware classifica cada resposta antes do parse das spiders:
+    ok: a resposta segue para o parse;
+    retryable: falhas transitórias (HTTP 429 e 5xx, limites de requisição,
+        respostas sem data ou fora do JSON, erros de rede), reenviadas com
+        espera exponencial aleatória (full jitter);
+    fatal: falhas que não se resolvem com uma nova tentativa (formkey
+        expirada, hash de persisted query desconhecido, demais HTTP 4xx),
+        descartadas com IgnoreRequest, que chega ao errback da requisição.
+
+Esgotado o orçamento da spider (QBudget.CrawlBudget), ou quando a espera
+passaria do deadline, as falhas retryable também são descartadas, para que os
+errbacks gravem os cursores sem atrasar o fim da coleta.
+
+As falhas de cada operação (queryName) em cada sessão (quora-formkey) passam
+por um CircuitBreaker: após threshold falhas seguidas, as requisições da
+operação naquela sessão aguardam cooldown segundos antes de seguir, e o
+cooldown dobra a cada nova abertura, até max_cooldown.
+
+O CredentialsMiddleware troca as credenciais da sessão (header
+quora-formkey e cookies) durante a coleta. As credenciais vêm do arquivo de
+parâmetros (CREDENTIALS_PATH), relido quando é modificado, por template
+(meta "template" das requisições das spiders), e do documento
+{"_id": "credentials"} da coleção control, no formato {"headers": {...},
+"cookies": {...}}, que vale para todas as operações. As requisições
+com falha de sessão aguardam até CREDENTIALS_WAIT segundos por credenciais
+novas e são reenviadas com elas, ou descartadas como fatal.
+
+A extensão ControlChannel executa os comandos gravados na coleção control
+(ver send_command) durante a coleta: pause, resume, throttle (concorrência e
+atraso por slot de download), inject (novos pares category-query na
+SearchSpider), flush e stop.
+
+As spiders habilitam os middlewares e a extensão com DOWNLOADER_MIDDLEWARES
+e EXTENSIONS em custom_settings. Os parâmetros são lidos das settings do
+Scrapy: GRAPHQL_RETRY_TIMES, GRAPHQL_BACKOFF_BASE, GRAPHQL_BACKOFF_MAX,
+GRAPHQL_BREAKER_THRESHOLD, GRAPHQL_BREAKER_COOLDOWN,
+GRAPHQL_BREAKER_MAX_COOLDOWN, CREDENTIALS_PATH, CREDENTIALS_CHECK_INTERVAL,
+CREDENTIALS_WAIT e CONTROL_POLL_INTERVAL.
+"""
+
+import json
+import os
+import random
+import time
+
+from datetime import datetime
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import task
+
+# Middlewares de download das spiders; o GraphQLErrorMiddleware substitui o
+# RetryMiddleware do Scrapy, na mesma posição, e o ArchiveMiddleware, ativo
+# com ARCHIVE_DIR, recebe somente as respostas aceitas
+DOWNLOADER_MIDDLEWARES = {
+    'scrapy.downloadermiddlewares.retry.RetryMiddleware': None,
+    'QArchive.ArchiveMiddleware': 530,
+    'QControl.CredentialsMiddleware': 540,
+    'QControl.GraphQLErrorMiddleware': 550,
+}
+
+# Extensões das spiders
+EXTENSIONS = {
+    'QControl.ControlChannel': 500,
+}
+
+# Headers de sessão do arquivo de parâmetros
+SESSION_HEADERS = ("quora-formkey",)
+
+# Motivos das falhas de sessão, tratadas pelo CredentialsMiddleware
+SESSION_REASONS = ("session", "http_401", "http_403")
+
+# Códigos HTTP de falhas transitórias
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524)
+
+# Trechos das mensagens de erro do GraphQL, em minúsculas:
+# (classificação, motivo, trechos)
+ERROR_MARKERS = (("retryable", "rate_limit",
+                  ("rate limit", "ratelimit", "too many", "throttl",
+                   "try again")),
+                 ("fatal", "persisted_query",
+                  ("persistedquery", "persisted query", "hash")),
+                 ("fatal", "session",
+                  ("formkey", "csrf", "unauthorized", "forbidden", "login",
+                   "permission")))
+
+
+def classify(response) -> tuple:
+    """
+    Classificação de uma resposta do GraphQL do Quora.
+
+    Parameters
+    ----------
+    response : scrapy.http.Response
+        Resposta da requisição.
+
+    Returns
+    -------
+    tuple
+        (classificação, motivo): ("ok", None), ("retryable", motivo) ou
+        ("fatal", motivo).
+
+    """
+    if response.status in RETRYABLE_STATUS:
+        return "retryable", f"http_{response.status}"
+    if response.status >= 400:
+        return "fatal", f"http_{response.status}"
+
+    try:
+        result = json.loads(response.body)
+    except ValueError:
+        # página de desafio, manutenção ou corpo truncado
+        return "retryable", "invalid_json"
+    if not isinstance(result, dict):
+        return "retryable", "invalid_json"
+
+    for error in result.get("errors") or []:
+        if isinstance(error, dict):
+            error = json.dumps(error)
+        message = str(error).lower()
+        for outcome, reason, markers in ERROR_MARKERS:
+            if any(marker in message for marker in markers):
+                return outcome, reason
+    if not result.get("data"):
+        return "retryable", "graphql_error" if result.get("errors") else (
+            "no_data")
+    return "ok", None
+
+
+def backoff(retries: int, base: float, maximum: float) -> float:
+    """Espera exponencial aleatória (full jitter) da tentativa retries."""
+    return random.uniform(0, min(maximum, base * 2 ** retries))
+
+
+def _operation(request) -> str:
+    """queryName do payload da requisição; a url se não houver."""
+    try:
+        return json.loads(request.body).get("queryName") or request.url
+    except (ValueError, AttributeError):
+        return request.url
+
+
+class CircuitBreaker:
+    """Disjuntor de falhas seguidas por chave (operação, sessão)."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60,
+                 max_cooldown: float = 1800):
+        """
+        Disjuntor de falhas.
+
+        Parameters
+        ----------
+        threshold : int, optional
+            Falhas seguidas que abrem o disjuntor. The default is 5.
+        cooldown : float, optional
+            Pausa, em segundos, da primeira abertura. The default is 60.
+        max_cooldown : float, optional
+            Pausa máxima, em segundos. The default is 1800.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        # chave: [falhas seguidas, aberto até, pausa da próxima abertura]
+        self._state = dict()
+
+    def wait(self, key) -> float:
+        """Segundos até o disjuntor da chave fechar; 0 se fechado."""
+        state = self._state.get(key)
+        if state is None:
+            return 0
+        return max(0, state[1] - time.monotonic())
+
+    def success(self, key):
+        """Fecha o disjuntor da chave."""
+        self._state.pop(key, None)
+
+    def failure(self, key) -> float:
+        """
+        Registra uma falha da chave.
+
+        Returns
+        -------
+        float
+            Pausa, em segundos, se a falha abriu o disjuntor; 0 caso
+            contrário.
+
+        """
+        state = self._state.setdefault(key, [0, 0, self.cooldown])
+        state[0] += 1
+        if state[0] < self.threshold or self.wait(key) > 0:
+            return 0
+        # aberto (ou de novo, após a pausa): a próxima pausa dobra
+        pause = state[2]
+        state[1] = time.monotonic() + pause
+        state[2] = min(self.max_cooldown, pause * 2)
+        return pause
+
+
+class GraphQLErrorMiddleware:
+    """Middleware de download que classifica e reenvia as respostas."""
+
+    def __init__(self, settings, stats, clock=None):
+        """
+        Middleware de classificação das respostas do GraphQL.
+
+        Parameters
+        ----------
+        settings : scrapy.settings.Settings
+            Settings do Scrapy.
+        stats : StatsCollector
+            Coletor de estatísticas do Scrapy, que recebe as contagens com
+            o prefixo "graphql/".
+        clock : IReactorTime, optional
+            Relógio das esperas. The default is None, que usa o reactor.
+
+        Returns
+        -------
+        None.
+
+        """
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self._clock = clock
+        self.stats = stats
+        self.max_retries = settings.getint("GRAPHQL_RETRY_TIMES", 5)
+        self.backoff_base = settings.getfloat("GRAPHQL_BACKOFF_BASE", 1.0)
+        self.backoff_max = settings.getfloat("GRAPHQL_BACKOFF_MAX", 300.0)
+        self.breaker = CircuitBreaker(
+            settings.getint("GRAPHQL_BREAKER_THRESHOLD", 5),
+            settings.getfloat("GRAPHQL_BREAKER_COOLDOWN", 60.0),
+            settings.getfloat("GRAPHQL_BREAKER_MAX_COOLDOWN", 1800.0))
+        # as falhas de sessão ficam para o CredentialsMiddleware, se ativo
+        self.credentials = settings.getwithbase("DOWNLOADER_MIDDLEWARES").get(
+            "QControl.CredentialsMiddleware") is not None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler.stats)
+
+    @staticmethod
+    def key(request) -> tuple:
+        """Chave (operação, sessão) da requisição no disjuntor."""
+        session = request.headers.get("quora-formkey")
+        if session is None and isinstance(request.cookies, dict):
+            session = request.cookies.get("m-b")
+        if isinstance(session, bytes):
+            session = session.decode()
+        return _operation(request), session
+
+    async def _sleep(self, seconds: float):
+        await maybe_deferred_to_future(
+            task.deferLater(self._clock, seconds, lambda: None))
+
+    @staticmethod
+    def _over_budget(spider, delay: float = 0) -> bool:
+        """Indica se o orçamento da spider acaba antes de delay segundos."""
+        budget = getattr(spider, "budget", None)
+        if budget is None:
+            return False
+        remaining = budget.remaining()
+        return bool(budget.exhausted()) or (remaining is not None
+                                            and delay >= remaining)
+
+    async def process_request(self, request, spider):
+        """Segura a requisição enquanto o disjuntor da chave estiver aberto."""
+        key = self.key(request)
+        delay = self.breaker.wait(key)
+        if delay > 0:
+            self.stats.inc_value("graphql/breaker_waits")
+        while delay > 0:
+            if self._over_budget(spider, delay):
+                # a pausa passaria do deadline: o errback grava o cursor
+                self.stats.inc_value("graphql/dropped/budget")
+                raise IgnoreRequest("budget")
+            await self._sleep(delay)
+            delay = self.breaker.wait(key)
+        return None
+
+    async def process_response(self, request, response, spider):
+        """Entrega as respostas ok e reenvia ou descarta as demais."""
+        outcome, reason = classify(response)
+        if outcome == "ok":
+            self.breaker.success(self.key(request))
+            return response
+        retry_after = response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after) if retry_after else 0
+        except ValueError:
+            retry_after = 0
+        if self.credentials and outcome == "fatal" and (
+                reason in SESSION_REASONS):
+            self._count(request, outcome, reason, spider)
+            return response
+        return await self._fail(request, outcome, reason, spider,
+                                retry_after)
+
+    async def process_exception(self, request, exception, spider):
+        """Erros de rede (timeout, conexão perdida...) são retryable."""
+        if isinstance(exception, IgnoreRequest):
+            return None
+        return await self._fail(request, "retryable",
+                                type(exception).__name__, spider)
+
+    def _count(self, request, outcome, reason, spider):
+        """Contabiliza a falha nas estatísticas e no disjuntor."""
+        self.stats.inc_value(f"graphql/{outcome}/{reason}")
+        key = self.key(request)
+        pause = self.breaker.failure(key)
+        if pause:
+            self.stats.inc_value("graphql/breaker_opened")
+            spider.logger.warning(f"{key[0]}: {reason}; requisições da "
+                                  f"sessão pausadas por {pause:.0f}s.")
+
+    async def _fail(self, request, outcome, reason, spider, retry_after=0):
+        self._count(request, outcome, reason, spider)
+        key = self.key(request)
+        retries = request.meta.get("graphql_retries", 0)
+        delay = max(retry_after, backoff(retries, self.backoff_base,
+                                         self.backoff_max))
+        if outcome == "retryable" and retries < self.max_retries and (
+                not self._over_budget(spider, delay)):
+            await self._sleep(delay)
+            retry = request.replace(dont_filter=True)
+            retry.meta["graphql_retries"] = retries + 1
+            self.stats.inc_value("graphql/retries")
+            return retry
+
+        self.stats.inc_value(f"graphql/dropped/{reason}")
+        spider.logger.error(f"{key[0]}: requisição descartada ({outcome}: "
+                            f"{reason}, {retries} tentativas).")
+        raise IgnoreRequest(f"{outcome}: {reason}")
+
+
+class SessionCredentials:
+    """Credenciais de sessão do arquivo de parâmetros e da coleção control."""
+
+    def __init__(self, path: str = None, collection=None):
+        """
+        Credenciais de sessão recarregáveis.
+
+        Parameters
+        ----------
+        path : str, optional
+            Arquivo de parâmetros de requisição. The default is None.
+        collection : Collection, optional
+            Coleção control do MongoDB. The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.path = path
+        self.collection = collection
+        # incrementada a cada mudança das credenciais
+        self.version = 0
+        self._mtime = None
+        # template: {"operation", "headers", "cookies"}
+        self._templates = dict()
+        self._override = dict()
+        self.refresh()
+
+    def _read_file(self) -> bool:
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            with open(self.path) as f:
+                params = json.loads(f.read())
+        except (OSError, ValueError):
+            # arquivo ausente ou gravado pela metade: fica para a próxima
+            return False
+        self._mtime = mtime
+
+        templates = dict()
+        for name, params in params.items():
+            if not isinstance(params, dict) or "cookies" not in params:
+                continue
+            operation = params.get("payload", {}).get("queryName")
+            templates[name] = {
+                "operation": (params.get("url"), operation or params.get(
+                    "url")),
+                # os templates variam a caixa dos headers (Quora-Formkey)
+                "headers": {k: v for k, v in params["headers"].items()
+                            if k.lower() in SESSION_HEADERS},
+                "cookies": params["cookies"]}
+        changed = templates != self._templates
+        self._templates = templates
+        return changed
+
+    def _read_collection(self) -> bool:
+        if self.collection is None:
+            return False
+        doc = self.collection.find_one({"_id": "credentials"},
+                                       {"headers": 1, "cookies": 1}) or {}
+        override = {"headers": doc.get("headers") or {},
+                    "cookies": doc.get("cookies") or {}}
+        changed = override != self._override and bool(
+            override["headers"] or override["cookies"] or self._override)
+        self._override = override
+        return changed
+
+    def refresh(self) -> bool:
+        """Relê as fontes; retorna True se as credenciais mudaram."""
+        changed = self._read_file()
+        changed = self._read_collection() or changed
+        if changed:
+            self.version += 1
+        return changed
+
+    def get(self, template: str = None, operation: tuple = None) -> tuple:
+        """
+        (headers, cookies) de sessão de um template do arquivo.
+
+        Parameters
+        ----------
+        template : str, optional
+            Chave do template no arquivo de parâmetros, por exemplo
+            "post-page". The default is None.
+        operation : tuple, optional
+            (url, queryName) da requisição, usado quando o template não é
+            informado ou não está no arquivo. The default is None.
+
+        Returns
+        -------
+        tuple
+            (headers, cookies), já com as credenciais da coleção control.
+
+        """
+        params = self._templates.get(template)
+        if params is None:
+            params = next((params for params in self._templates.values()
+                           if params["operation"] == operation), {})
+        headers = dict(params.get("headers", {}),
+                       **self._override.get("headers", {}))
+        cookies = dict(params.get("cookies", {}),
+                       **self._override.get("cookies", {}))
+        return headers, cookies
+
+
+class CredentialsMiddleware:
+    """Middleware de download que aplica as credenciais mais recentes."""
+
+    def __init__(self, settings, stats, clock=None):
+        """
+        Middleware de troca das credenciais de sessão.
+
+        Parameters
+        ----------
+        settings : scrapy.settings.Settings
+            Settings do Scrapy.
+        stats : StatsCollector
+            Coletor de estatísticas do Scrapy, que recebe as contagens com
+            o prefixo "credentials/".
+        clock : IReactorTime, optional
+            Relógio das esperas. The default is None, que usa o reactor.
+
+        Returns
+        -------
+        None.
+
+        """
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self._clock = clock
+        self.stats = stats
+        self.path = settings.get("CREDENTIALS_PATH")
+        self.interval = settings.getfloat("CREDENTIALS_CHECK_INTERVAL", 30.0)
+        self.wait = settings.getfloat("CREDENTIALS_WAIT", 600.0)
+        self.credentials = None
+        self._checked = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler.stats)
+
+    def _refresh(self, spider) -> bool:
+        if self.credentials is None:
+            db = getattr(spider, "_db", None)
+            self.credentials = SessionCredentials(
+                self.path, None if db is None else db["control"])
+            self._checked = time.monotonic()
+            return False
+        if time.monotonic() - self._checked < self.interval:
+            return False
+        self._checked = time.monotonic()
+        if self.credentials.refresh():
+            self.stats.inc_value("credentials/reloads")
+            spider.logger.info("Credenciais de sessão recarregadas.")
+            return True
+        return False
+
+    def process_request(self, request, spider):
+        """Aplica as credenciais atuais às requisições criadas antes delas."""
+        self._refresh(spider)
+        version = self.credentials.version
+        if request.meta.get("credentials_version") == version:
+            return None
+        request.meta["credentials_version"] = version
+        if version == 0:
+            return None
+        headers, cookies = self.credentials.get(
+            request.meta.get("template"), (request.url, _operation(request)))
+        for name, value in headers.items():
+            request.headers[name] = value
+        if cookies and isinstance(request.cookies, dict):
+            request.cookies.update(cookies)
+        return None
+
+    async def process_response(self, request, response, spider):
+        """Reenvia com credenciais novas as requisições com sessão inválida."""
+        outcome, reason = classify(response)
+        if outcome != "fatal" or reason not in SESSION_REASONS:
+            return response
+
+        version = request.meta.get("credentials_version", 0)
+        deadline = time.monotonic() + self.wait
+        self._refresh(spider)
+        while self.credentials.version == version and (
+                time.monotonic() < deadline):
+            self.stats.inc_value("credentials/waits")
+            await maybe_deferred_to_future(task.deferLater(
+                self._clock, max(self.interval, 1), lambda: None))
+            self._refresh(spider)
+        if self.credentials.version == version:
+            self.stats.inc_value(f"graphql/dropped/{reason}")
+            spider.logger.error(f"{_operation(request)}: requisição "
+                                f"descartada ({outcome}: {reason}), sem "
+                                f"credenciais novas.")
+            raise IgnoreRequest(f"{outcome}: {reason}")
+
+        self.stats.inc_value("credentials/reissued")
+        retry = request.replace(dont_filter=True)
+        retry.meta.pop("credentials_version", None)
+        return retry
+
+
+def send_command(db, command: str, spider: str = None, **args):
+    """
+    Grava um comando para as coletas em curso no banco db.
+
+    Parameters
+    ----------
+    db : Database
+        Banco de dados do MongoDB da coleta.
+    command : str
+        Um dos comandos do ControlChannel:
+            "pause" e "resume": suspende e retoma o agendamento de
+                requisições; as que já estão em curso terminam;
+            "throttle": altera concurrency e/ou delay (em segundos) do slot
+                de download slot, ou de todos se slot não for informado;
+            "inject": adiciona os pairs [[category, query], ...] a uma
+                SearchSpider em curso;
+            "flush": envia ao banco as escritas pendentes;
+            "stop": esgota o orçamento da execução, para que as paginações
+                em curso gravem seus cursores; com force=True, encerra a
+                spider imediatamente.
+    spider : str, optional
+        name da spider destinatária. The default is None, qualquer spider.
+    **args
+        Argumentos do comando.
+
+    Returns
+    -------
+    ObjectId
+        Identificação do comando; status e result são gravados no documento
+        após a execução.
+
+    """
+    if command not in ControlChannel.commands:
+        raise ValueError("Especifique o command corretamente.")
+    doc = {"command": command, "args": args, "status": "pending",
+           "created_at": datetime.utcnow()}
+    if spider is not None:
+        doc["spider"] = spider
+    return db["control"].insert_one(doc).inserted_id
+
+
+class ControlChannel:
+    """Extensão do Scrapy que executa os comandos da coleção control."""
+
+    commands = ("pause", "resume", "throttle", "inject", "flush", "stop")
+
+    def __init__(self, crawler, interval: float = 5.0):
+        """
+        Canal de controle de uma spider em curso.
+
+        Parameters
+        ----------
+        crawler : scrapy.crawler.Crawler
+            Crawler da spider.
+        interval : float, optional
+            Intervalo, em segundos, entre as leituras da coleção control.
+            The default is 5.0.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.crawler = crawler
+        self.interval = interval
+        self.spider = None
+        self._loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        ext = cls(crawler,
+                  crawler.settings.getfloat("CONTROL_POLL_INTERVAL", 5.0))
+        crawler.signals.connect(ext.spider_opened, signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        if getattr(spider, "_db", None) is None:
+            return
+        self.spider = spider
+        self._loop = task.LoopingCall(self.poll)
+        self._loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+
+    def poll(self):
+        """Executa, em ordem, os comandos pendentes para esta spider."""
+        collection = self.spider._db["control"]
+        pending = collection.find(
+            {"status": "pending", "spider": {"$in": [None, self.spider.name]}},
+            sort=[("_id", 1)])
+        for doc in list(pending):
+            if doc["command"] == "inject" and not hasattr(self.spider,
+                                                          "inject"):
+                continue
+            # um comando sem spider é executado pela primeira que o ler
+            claimed = collection.update_one(
+                {"_id": doc["_id"], "status": "pending"},
+                {"$set": {"status": "running", "spider": self.spider.name}})
+            if not claimed.modified_count:
+                continue
+            try:
+                result, status = self.execute(doc["command"],
+                                              doc.get("args") or {}), "done"
+            except Exception as e:
+                result, status = repr(e), "error"
+            self.crawler.stats.inc_value(f"control/{doc['command']}")
+            collection.update_one({"_id": doc["_id"]},
+                                  {"$set": {"status": status,
+                                            "result": result,
+                                            "done_at": datetime.utcnow()}})
+
+    def execute(self, command: str, args: dict):
+        """Executa um comando; o retorno é gravado em result."""
+        engine = self.crawler.engine
+        spider = self.spider
+        if command == "pause":
+            engine.pause()
+        elif command == "resume":
+            engine.unpause()
+        elif command == "throttle":
+            return self._throttle(**args)
+        elif command == "inject":
+            if not hasattr(spider, "inject"):
+                raise ValueError(f"{spider.name} não aceita inject.")
+            return spider.inject(args["pairs"])
+        elif command == "flush":
+            spider._storage.writer.flush()
+        elif command == "stop":
+            engine.unpause()
+            if args.get("force"):
+                engine.close_spider(spider, "control_stop")
+            else:
+                spider.budget.stop()
+        else:
+            raise ValueError("Especifique o command corretamente.")
+        return None
+
+    def _throttle(self, concurrency: int = None, delay: float = None,
+                  slot: str = None) -> list:
+        downloader = self.crawler.engine.downloader
+        if slot is None:
+            # vale também para os slots criados depois do comando
+            if concurrency is not None:
+                self.spider.max_concurrent_requests = concurrency
+                downloader.total_concurrency = concurrency
+            if delay is not None:
+                self.spider.download_delay = delay
+            slots = list(downloader.slots)
+        else:
+            slots = [slot]
+        for key in slots:
+            if key not in downloader.slots:
+                raise ValueError(f"Slot {key} inexistente.")
+            if concurrency is not None:
+                downloader.slots[key].concurrency = concurrency
+            if delay is not None:
+                downloader.slots[key].delay = delay
+        return slots
@@ -0,0 +1,154 @@
+"""Created on Mon October 19 05:10:00 2026.
+
+Estruturas compactas para as fronteiras de coleta do QScraper.
+
+O UidSet guarda identificadores inteiros (uid, qid, ...) em um array ordenado
+de inteiros de 64 bits, 8 bytes por elemento, em vez dos ~70 bytes de um int
+em um set do Python. As inserções vão para um set pequeno, incorporado ao
+array quando ultrapassa merge_size elementos.
+
+O BloomFilter ocupa memória fixa, independente da quantidade de elementos,
+ao custo de uma pequena taxa de falsos positivos.
+"""
+
+import hashlib
+import math
+
+from array import array
+from bisect import bisect_left
+
+
+class UidSet:
+    """Conjunto compacto de inteiros de 64 bits."""
+
+    # elementos pendentes antes da incorporação ao array ordenado
+    merge_size = 65536
+
+    def __init__(self, values=()):
+        """
+        Conjunto compacto de inteiros.
+
+        Parameters
+        ----------
+        values : iterable, optional
+            Valores iniciais. The default is ().
+
+        Returns
+        -------
+        None.
+
+        """
+        self._sorted = array("q")
+        self._pending = set()
+        for value in values:
+            self.add(value)
+        self._merge()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        merged = array("q")
+        pending = sorted(self._pending)
+        i = j = 0
+        while i < len(self._sorted) and j < len(pending):
+            if self._sorted[i] < pending[j]:
+                merged.append(self._sorted[i])
+                i += 1
+            else:
+                merged.append(pending[j])
+                j += 1
+        merged.extend(self._sorted[i:])
+        merged.extend(pending[j:])
+        self._sorted = merged
+        self._pending = set()
+
+    def __contains__(self, value) -> bool:
+        if value in self._pending:
+            return True
+        i = bisect_left(self._sorted, value)
+        return i < len(self._sorted) and self._sorted[i] == value
+
+    def add(self, value) -> bool:
+        """Adiciona value; retorna False se ele já estava no conjunto."""
+        if value in self:
+            return False
+        self._pending.add(value)
+        if len(self._pending) >= self.merge_size:
+            self._merge()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._pending)
+
+    @property
+    def nbytes(self) -> int:
+        """Memória aproximada ocupada pelos elementos, em bytes."""
+        return (self._sorted.itemsize * len(self._sorted)
+                + 70 * len(self._pending))
+
+
+class BloomFilter:
+    """Filtro de Bloom de tamanho fixo para identificadores já vistos."""
+
+    def __init__(self, capacity: int = 10_000_000, error_rate: float = 0.001):
+        """
+        Filtro de Bloom dimensionado para capacity elementos.
+
+        A memória é fixa, m = -n ln(p) / ln(2)^2 bits (cerca de 18 MB para
+        10 milhões de elementos e p = 0.001), e o filtro nunca esquece um
+        elemento adicionado; com probabilidade error_rate, um elemento novo
+        é dado como já visto.
+
+        Parameters
+        ----------
+        capacity : int, optional
+            Quantidade esperada de elementos. The default is 10_000_000.
+        error_rate : float, optional
+            Taxa de falsos positivos com capacity elementos. The default is
+            0.001.
+
+        Raises
+        ------
+        ValueError
+            Erro caso capacity ou error_rate sejam inválidos.
+
+        Returns
+        -------
+        None.
+
+        """
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("Especifique capacity e error_rate corretamente.")
+        self.size = max(8, int(-capacity * math.log(error_rate)
+                               / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, value) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7))
+                   for p in self._positions(value))
+
+    def add(self, value) -> bool:
+        """Adiciona value; retorna False se ele (provavelmente) já estava."""
+        new = False
+        for p in self._positions(value):
+            if not self._bits[p >> 3] & (1 << (p & 7)):
+                self._bits[p >> 3] |= 1 << (p & 7)
+                new = True
+        self.count += new
+        return new
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelo filtro, em bytes."""
+        return len(self._bits)
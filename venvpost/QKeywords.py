@@ -0,0 +1,169 @@
+"""Created on Mon October 19 01:40:00 2026.
+
+Fontes de palavras-chave do QScraper.
+
+As palavras-chave chegam à SearchSpider como pares (category, query) em
+minúsculas e sem espaços nas pontas (ver normalize), qualquer que seja a
+fonte. As fontes JSONL, CSV e MongoDB são lidas sob demanda, sem carregar a
+lista inteira na memória.
+"""
+
+import csv
+import json
+import logging
+import re
+
+from QStorage import stream
+
+_logger = logging.getLogger(__name__)
+
+
+def normalize(category: str, query: str) -> tuple:
+    """Par (category, query) em minúsculas e sem espaços nas pontas."""
+    return category.strip().lower(), query.strip().lower()
+
+
+def iter_dict(queries: dict):
+    """Pares (category, query) do formato {category: [query, ...]}."""
+    for category, items in queries.items():
+        for query in ([items] if isinstance(items, str) else items):
+            yield normalize(category, query)
+
+
+def iter_jsonl(filepath: str):
+    """
+    Pares (category, query) de um arquivo JSONL.
+
+    Cada linha deve ser um objeto {"category": ..., "query": ...} ou uma
+    lista [category, query]. Linhas em branco são ignoradas.
+    """
+    with open(filepath, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if isinstance(row, dict):
+                row = (row["category"], row["query"])
+            category, query = row
+            yield normalize(category, query)
+
+
+def iter_csv(filepath: str):
+    """
+    Pares (category, query) de um arquivo CSV com as colunas category e query.
+
+    O cabeçalho "category,query", se existir, é ignorado. Linhas com menos
+    de duas colunas são ignoradas e registradas no log.
+    """
+    with open(filepath, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        for i, row in enumerate(reader):
+            if not row:
+                continue
+            if len(row) < 2:
+                _logger.warning(f"Linha {reader.line_num} de {filepath} "
+                                f"ignorada: {row}.")
+                continue
+            category, query = normalize(row[0], row[1])
+            if i == 0 and (category, query) == ("category", "query"):
+                continue
+            yield category, query
+
+
+def iter_collection(collection, batch_size=1000):
+    """Pares (category, query) dos documentos de uma coleção do MongoDB."""
+    for doc in stream(collection, projection={"category": 1, "query": 1},
+                      batch_size=batch_size):
+        yield normalize(doc["category"], doc["query"])
+
+
+def keyword_pairs(source):
+    """
+    Pares (category, query) de qualquer fonte de palavras-chave aceita.
+
+    Parameters
+    ----------
+    source : dict, str, Collection ou iterable
+        {category: [query, ...]} já lido; caminho para um arquivo .jsonl ou
+        .csv; coleção do MongoDB com os campos category e query; ou um
+        iterável de pares (category, query).
+
+    Raises
+    ------
+    ValueError
+        Erro caso o arquivo não seja .jsonl ou .csv.
+
+    Returns
+    -------
+    iterator
+        Pares (category, query), gerados sob demanda.
+
+    """
+    if isinstance(source, dict):
+        return iter_dict(source)
+    if isinstance(source, str):
+        if source.endswith(".jsonl"):
+            return iter_jsonl(source)
+        if source.endswith(".csv"):
+            return iter_csv(source)
+        raise ValueError("A fonte de palavras-chave deve ser .jsonl ou .csv.")
+    if hasattr(source, "find"):
+        return iter_collection(source)
+    return (normalize(category, query) for category, query in source)
+
+
+def vocabulary(source) -> dict:
+    """
+    Termos de busca de uma fonte de palavras-chave.
+
+    Queries entre aspas exigem a expressão exata; as demais, todas as
+    palavras em qualquer ordem, como na busca do Quora.
+
+    Parameters
+    ----------
+    source : dict, str, Collection ou iterable
+        Arquivo .json no formato {category: [query, ...]} ou qualquer fonte
+        aceita por keyword_pairs.
+
+    Returns
+    -------
+    dict
+        Pares (category, query) de cada termo, no formato
+        {(exato, expressão ou palavras): [(category, query), ...]}.
+
+    """
+    if isinstance(source, str) and source.endswith(".json"):
+        with open(source, encoding="utf-8") as f:
+            source = json.load(f)
+    terms = dict()
+    for category, query in keyword_pairs(source):
+        if len(query) > 1 and query[0] == query[-1] == '"':
+            term = (True, query.strip('"'))
+        else:
+            term = (False, tuple(re.findall(r"\w+", query)))
+        terms.setdefault(term, []).append((category, query))
+    return terms
+
+
+def plain_text(text: str) -> str:
+    """Texto puro de um título do Quora, em JSON {"sections": [...]}."""
+    try:
+        doc = json.loads(text)
+    except (TypeError, ValueError):
+        return text or ""
+    if not isinstance(doc, dict):
+        return text
+    return " ".join(span.get("text", "")
+                    for section in doc.get("sections", [])
+                    for span in section.get("spans", []))
+
+
+def matching_pairs(text: str, terms: dict) -> list:
+    """Pares (category, query) dos termos do vocabulary presentes no texto."""
+    text = text.lower()
+    words = set(re.findall(r"\w+", text))
+    pairs = []
+    for (exact, term), term_pairs in terms.items():
+        if (term in text) if exact else all(word in words for word in term):
+            pairs.extend(term_pairs)
+    return pairs
@@ -0,0 +1,246 @@
+"""Created on Mon October 19 02:30:00 2026.
+
+Política de revisita das perguntas já coletadas.
+
+A cada coleta completa das respostas de uma pergunta, a AnswerSpider registra
+na coleção revisits o instante da visita e a quantidade de respostas
+encontradas. Do histórico de visitas estima-se a taxa de mudança de cada
+pergunta (processo de Poisson, estimador de Cho & Garcia-Molina) e, dado um
+orçamento de requisições, escolhem-se as perguntas cuja revisita mais aumenta
+o frescor esperado da coleção. As escolhidas são colocadas na fila tmp, lida
+pela AnswerSpider.
+
+A question_priority é a prioridade padrão das requisições da AnswerSpider,
+calculada a partir dos sinais conhecidos de cada pergunta antes da coleta.
+"""
+
+import heapq
+import math
+
+from datetime import datetime
+
+from QStorage import BulkWriter
+from QStorage import stream
+
+# Respostas por página da AnswerSpider
+ANSWERS_PER_PAGE = 12
+
+
+def change_rate(history: list, default_rate: float,
+                min_rate: float = 1e-9) -> float:
+    """
+    Taxa de mudança estimada, em mudanças por segundo.
+
+    Cada intervalo entre visitas consecutivas é tratado como uma observação;
+    há mudança quando a quantidade de respostas difere da visita anterior. A
+    taxa é estimada por -ln((n - X + 0.5) / (n + 0.5)) / I, onde n é a
+    quantidade de intervalos, X a de intervalos com mudança e I o intervalo
+    médio.
+
+    Parameters
+    ----------
+    history : list
+        Visitas em ordem cronológica, no formato {"t": datetime,
+        "answers": int}.
+    default_rate : float
+        Taxa usada enquanto há menos de duas visitas.
+    min_rate : float, optional
+        Menor taxa devolvida. The default is 1e-9.
+
+    Returns
+    -------
+    float
+        Taxa de mudança estimada.
+
+    """
+    if len(history) < 2:
+        return default_rate
+
+    n = len(history) - 1
+    changes = sum(1 for prev, curr in zip(history, history[1:])
+                  if curr["answers"] != prev["answers"])
+    elapsed = (history[-1]["t"] - history[0]["t"]).total_seconds()
+    if elapsed <= 0:
+        return default_rate
+
+    rate = -math.log((n - changes + 0.5) / (n + 0.5)) / (elapsed / n)
+    return max(rate, min_rate)
+
+
+def freshness_gain(rate: float, age: float, horizon: float) -> float:
+    """
+    Ganho de frescor esperado ao revisitar uma pergunta agora.
+
+    É a probabilidade de a cópia armazenada estar desatualizada após age
+    segundos, multiplicada pelo frescor médio da nova cópia ao longo dos
+    próximos horizon segundos. Perguntas que mudam rápido demais para se
+    manterem frescas rendem pouco, como no resultado de Cho & Garcia-Molina.
+    """
+    stale = -math.expm1(-rate * age)
+    if rate * horizon < 1e-12:
+        return stale
+    return stale * -math.expm1(-rate * horizon) / (rate * horizon)
+
+
+class RevisitPolicy:
+    """Registro de visitas e escalonamento das revisitas de perguntas."""
+
+    # visitas mantidas no histórico de cada pergunta
+    history_size = 20
+
+    def __init__(self, db, writer: BulkWriter = None,
+                 default_rate: float = 1 / 86400):
+        """
+        Política de revisita das perguntas da coleção revisits.
+
+        Parameters
+        ----------
+        db : Database
+            Banco de dados do MongoDB.
+        writer : BulkWriter, optional
+            Buffer de escritas usado pelo record. The default is None, que
+            cria um BulkWriter próprio.
+        default_rate : float, optional
+            Taxa de mudança, em mudanças por segundo, assumida para perguntas
+            com uma única visita. The default is 1 / 86400 (uma por dia).
+
+        Returns
+        -------
+        None.
+
+        """
+        self._db = db
+        self._own_writer = writer is None
+        self.writer = writer if writer is not None else BulkWriter(db)
+        self.default_rate = default_rate
+
+    def record(self, qid: int, answers: int, category: str = None,
+               query: str = None):
+        """Registra a quantidade de respostas encontradas em uma visita."""
+        now = datetime.utcnow()
+        update = {"$set": {"last_visit": now, "answers": answers},
+                  "$push": {"history": {"$each": [{"t": now,
+                                                   "answers": answers}],
+                                        "$slice": -self.history_size}},
+                  "$inc": {"visits": 1}}
+        if category is not None:
+            update["$set"].update({"category": category, "query": query})
+        self.writer.update("revisits", {"_id": qid}, update, upsert=True)
+
+    def forget(self, qid: int):
+        """Remove a pergunta das revisitas (pergunta removida)."""
+        self.writer.delete("revisits", {"_id": qid})
+
+    def answer_counts(self, qids: list) -> dict:
+        """Respostas encontradas na última visita de cada pergunta."""
+        return {doc["_id"]: doc.get("answers")
+                for doc in self._db["revisits"].find(
+                    {"_id": {"$in": list(qids)}}, {"answers": 1})}
+
+    def schedule(self, budget: int, horizon: float = 86400,
+                 now: datetime = None) -> list:
+        """
+        Perguntas a revisitar dentro de um orçamento de requisições.
+
+        Cada revisita custa uma requisição por página de respostas. As
+        perguntas são escolhidas pelo ganho de frescor esperado por
+        requisição, até esgotar o orçamento.
+
+        Parameters
+        ----------
+        budget : int
+            Quantidade máxima de requisições da revisita.
+        horizon : float, optional
+            Intervalo, em segundos, até a próxima revisita. The default is
+            86400.
+        now : datetime, optional
+            Instante da revisita. The default is None, que usa utcnow.
+
+        Returns
+        -------
+        list
+            Documentos {"_id": qid, "category", "query", "gain", "pages"},
+            em ordem decrescente de ganho por requisição.
+
+        """
+        now = now or datetime.utcnow()
+        heap = []
+        docs = stream(self._db["revisits"],
+                      projection={"history": 1, "last_visit": 1,
+                                  "answers": 1, "category": 1, "query": 1})
+        for doc in docs:
+            rate = change_rate(doc.get("history", []), self.default_rate)
+            age = (now - doc["last_visit"]).total_seconds()
+            pages = max(1, math.ceil(doc.get("answers", 0)
+                                     / ANSWERS_PER_PAGE))
+            gain = freshness_gain(rate, age, horizon)
+            if gain <= 0:
+                continue
+            # mantém apenas as candidatas que cabem no orçamento
+            item = (gain / pages, doc["_id"], gain, pages, doc)
+            if len(heap) < budget:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        chosen, spent = [], 0
+        for _, qid, gain, pages, doc in sorted(heap, reverse=True):
+            if spent + pages > budget:
+                continue
+            spent += pages
+            chosen.append({"_id": qid, "category": doc.get("category"),
+                           "query": doc.get("query"), "gain": gain,
+                           "pages": pages})
+        return chosen
+
+    def enqueue(self, budget: int, horizon: float = 86400) -> int:
+        """
+        Coloca na fila tmp as perguntas escolhidas pelo schedule.
+
+        Returns
+        -------
+        int
+            Quantidade de perguntas enfileiradas.
+
+        """
+        chosen = self.schedule(budget, horizon)
+        for doc in chosen:
+            self.writer.update("tmp", {"_id": doc["_id"]},
+                               {"$set": {"category": doc["category"],
+                                         "query": doc["query"]}},
+                               upsert=True)
+        self.writer.flush("tmp")
+        return len(chosen)
+
+    def close(self):
+        """Envia ao banco as escritas pendentes do writer próprio."""
+        if self._own_writer:
+            self.writer.close()
+
+
+def question_priority(question: dict) -> int:
+    """
+    Prioridade padrão da coleta de respostas de uma pergunta.
+
+    Combina, em escala logarítmica, os sinais conhecidos antes da coleta:
+    seguidores e comentários da pergunta, respostas encontradas na última
+    visita (coleção revisits) e a posição da pergunta nos resultados da
+    busca, que reduz a prioridade.
+
+    Parameters
+    ----------
+    question : dict
+        Documento da fila tmp, com os campos opcionais followerCount,
+        numDisplayComments, answers e rank.
+
+    Returns
+    -------
+    int
+        Prioridade da requisição; maiores são coletadas primeiro.
+
+    """
+    score = (10 * math.log1p(question.get("followerCount") or 0)
+             + 5 * math.log1p(question.get("numDisplayComments") or 0)
+             + 10 * math.log1p(question.get("answers") or 0)
+             - 5 * math.log1p(question.get("rank") or 0))
+    return int(round(score))
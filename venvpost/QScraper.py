@@ -7,11 +7,36 @@ do projeto final de graduação:
     
 """
 
+import heapq
+
 import scrapy
+import scrapy.exceptions
 import scrapy.http
+import scrapy.signals
 
+from datetime import datetime
+from datetime import timedelta
+from itertools import chain
+from itertools import groupby
+from itertools import islice
 from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
+from QArchive import category_fanout
+from QBudget import CrawlBudget
+from QCache import HTTPCACHE_SETTINGS
+from QControl import DOWNLOADER_MIDDLEWARES
+from QControl import EXTENSIONS
+from QFrontier import BloomFilter
+from QFrontier import UidSet
+from QKeywords import keyword_pairs
+from QKeywords import matching_pairs
+from QKeywords import plain_text
+from QKeywords import vocabulary as _vocabulary
+from QScheduler import RevisitPolicy
+from QScheduler import question_priority
+from QStorage import Namespace
+from QStorage import SEARCH_RESULT_TYPES
+from QStorage import Storage
+from QStorage import stream
 from tqdm import tqdm
 
 
@@ -21,20 +46,36 @@ class SearchSpider(scrapy.Spider):
     name = 'quora_search_spider'
 
     custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
         'DOWNLOAD_DELAY': 0.05,
         'CONCURRENT_REQUESTS': 10,
     }
 
-    def __init__(self, queries: dict, requests_params: dict,
-                 client: MongoClient, result_type="question"):
+    # pares category-query lidos da fonte de palavras-chave por vez
+    keyword_batch_size = 1000
+
+    # valores aceitos pelo filtro de tempo ("time") da busca do Quora
+    time_filters = ("all_times", "year", "month", "week", "day", "hour")
+
+    def __init__(self, queries, requests_params: dict,
+                 client: MongoClient, result_type="question",
+                 storage_options: dict = None, fresh_ttl: float = None,
+                 fresh_mode="skip", budget: CrawlBudget = None,
+                 resume=False, time_partitions: list = None,
+                 database: str = "quora_database", prefix: str = ""):
         """
         Classe derivada de scrapy.Spider criada para coleta de dados do Quora.
 
         Parameters
         ----------
-        queries : dict
+        queries : dict, str, Collection ou iterable
             Queries que serão utilizadas nas requisições, no formato:
-                {chave: [valor1, valor2, ...]}.
+                {chave: [valor1, valor2, ...]},
+            ou uma fonte de pares (category, query) lida sob demanda:
+            arquivo .jsonl ou .csv, coleção do MongoDB ou iterável (ver
+            QKeywords.keyword_pairs).
         requests_params : dict
             Parâmetros da requisição.
         client : MongoClient
@@ -43,11 +84,49 @@ class SearchSpider(scrapy.Spider):
             Filtro do tipo de dado buscado. The default is "question".
             Deve ser um dos valores: ["all_types", "question", "answer",
                                       "post", "profile", "topic", "tribe"].
+            Cada tipo de resultado é gravado em sua coleção e relacionado
+            ao par category-query (ver QStorage.SEARCH_RESULT_TYPES); com
+            "all_types", todos na mesma passagem.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage), como
+            relation_layout, relation_keys, content_dedup, batch_size,
+            raw_bson e encoder_processes. The default is None.
+        fresh_ttl : float, optional
+            Validade, em segundos, da última busca completa de uma query.
+            Queries buscadas por completo há menos de fresh_ttl segundos são
+            tratadas segundo o fresh_mode. The default is None, que busca
+            todas as queries.
+        fresh_mode : str, optional
+            Tratamento das queries ainda válidas. The default is "skip".
+            Deve ser um dos valores:
+                "skip": a query não é buscada;
+                "first_page": somente a primeira página é buscada e a query
+                    só é paginada se houver resultados inéditos.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo, compartilhado com as
+            demais spiders da execução. The default is None, sem limite.
+        resume : bool, optional
+            Retoma as buscas interrompidas pelo orçamento na execução
+            anterior e mantém a fila tmp. The default is False.
+        time_partitions : list, optional
+            Filtros de tempo em que cada query é dividida, por exemplo
+            ["all_times", "year", "month", "week"]. Cada filtro é paginado
+            como um cursor independente e os resultados repetidos entre eles
+            são descartados; nas buscas retomadas, os repetidos são
+            reconhecidos pelas relações já gravadas. The default is None,
+            que usa somente o "time" do arquivo de parâmetros.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
 
         Raises
         ------
         ValueError
             Erro caso o result_type seja definido fora dos padrões.
+            Erro caso o fresh_mode seja definido fora dos padrões.
+            Erro caso o time_partitions seja definido fora dos padrões.
             Erro caso o requests_params seja definido fora dos padrões.
         PermissionError
             Erro caso não seja possível conectar ao MongoDB.
@@ -67,6 +146,13 @@ class SearchSpider(scrapy.Spider):
         else:
             raise ValueError("Especifique o result_type corretamente.")
 
+        if fresh_mode not in ["skip", "first_page"]:
+            raise ValueError("Especifique o fresh_mode corretamente.")
+        self.fresh_ttl = fresh_ttl
+        self.fresh_mode = fresh_mode
+        self.budget = budget if budget is not None else CrawlBudget()
+        self.resume = resume
+
         # Atributos da request da página de busca
         try:
             self.url = requests_params['search-page']['url']
@@ -77,72 +163,301 @@ class SearchSpider(scrapy.Spider):
         except Exception:
             raise ValueError("Verifique o arquivo de parâmetros.")
 
+        if time_partitions is None:
+            time_partitions = [self.payload["variables"].get("time",
+                                                             "all_times")]
+        if not time_partitions or any(t not in self.time_filters
+                                      for t in time_partitions):
+            raise ValueError("Especifique o time_partitions corretamente.")
+        self.time_partitions = list(dict.fromkeys(time_partitions))
+
         # Atribuindo o banco de dados
         if not isinstance(client, MongoClient):
             raise ValueError("É necessário definir um cliente do MongoDB.")
+        self._db = Namespace(client, database, prefix)
         try:
-            self._db = client["quora_database"]
-            self._db["tmp"].drop()
+            if not resume:
+                self._db["tmp"].drop()
         except Exception as e:
             raise PermissionError(e)
-
-        for cat in queries:
-            # inserindo category inéditas no banco - coleção category
-            try:
-                self._db['category'].insert_one({"_id": cat})
-            except DuplicateKeyError:
-                pass
-
-            for q in queries[cat]:
-                # inserindo queries inéditas no banco - coleção query
-                try:
-                    self._db['query'].insert_one(
-                        {"_id": q})
-                except DuplicateKeyError:
-                    pass
-
-                # inserindo relações category-query inéditas no banco
-                # - coleção category_query
-                try:
-                    self._db['category_query'].insert_one(
-                        {"_id": f"{cat}_{q}",
-                         "query": q,
-                         "category": cat}
-                    )
-                except DuplicateKeyError:
-                    pass
+        self._storage = Storage(self._db, **(storage_options or {}))
+
+        # categories de cada query em busca, na ordem em que apareceram; os
+        # resultados da query são replicados para todas elas. As queries
+        # saem daqui ao fim da busca e as repetidas depois disso são
+        # resolvidas pelo banco (Storage.searched_queries)
+        self._fanout = dict()
+        # partições em curso de cada query: [restantes, todas completas]
+        self._partitions = dict()
+        # resultados já vistos de cada query dividida em partições; nas
+        # buscas retomadas com resume, os das partições anteriores à
+        # interrupção são consultados no banco a cada página
+        self._seen = dict()
+        self._resumed = set()
+        # queries em busca já colocadas na fila post_queue
+        self._post_queries = set()
+        # início da execução: buscas terminadas desde então
+        self._started = datetime.utcnow()
 
     def start_requests(self):
-        """Gerencia as requisições do Scrapy."""
-        self.hasNextPage = dict()
-        for category, queries in self.queries.items():
-            for query in queries:
-                # utilizado no loop de coleta de dados.
-                self.hasNextPage[query] = True
-
-                # variáveis de coleta de dados
-                self._after = -1
-                self.payload["variables"]["after"] = str(self._after)
-                self.payload["variables"]["query"] = query
-                self.payload["variables"]["resultType"] = self.result_type
-
-                while True:
-                    try:
-                        yield scrapy.http.JsonRequest(
-                            url=self.url,
-                            headers=self.headers,
-                            data=self.payload,
-                            cookies=self.cookies,
-                            callback=self.parse,
-                            cb_kwargs={'query': query,
-                                       'category': category}
-                        )
-                    except Exception as e:
-                        print(e)
-                    if not self.hasNextPage[query]:
-                        break
-
-    def parse(self, response, category, query):
+        """
+        Gerencia as requisições do Scrapy.
+
+        As palavras-chave são lidas em blocos de keyword_batch_size pares.
+        Cada bloco é registrado no banco e gera a requisição da primeira
+        página de cada query; as páginas seguintes são geradas pelo parse.
+
+        Cada query distinta é buscada uma única vez. Se ela aparecer em outra
+        category, os resultados são replicados para a nova category: as
+        páginas seguintes pelo parse e as já gravadas pela
+        Storage.copy_category_query. Somente as queries em busca ficam na
+        memória; as que já terminaram são consultadas no banco.
+
+        Com time_partitions, cada query gera uma requisição por filtro de
+        tempo (ver _start).
+
+        Esgotado o orçamento, a leitura das palavras-chave é interrompida e a
+        posição alcançada é gravada; com resume, a leitura recomeça dessa
+        posição, depois das buscas interrompidas.
+        """
+        pairs = keyword_pairs(self.queries)
+        position = 0
+        if self.resume:
+            for query, cursors in groupby(self._storage.cursors(),
+                                          key=lambda cursor: cursor[0]):
+                cursors = list(cursors)
+                categories = cursors[0][1]
+                self._fanout[query] = list(categories)
+                # todas as partições são abertas antes da primeira requisição
+                self._open_partitions(query, len(cursors))
+                if len(self.time_partitions) > 1:
+                    self._seen.setdefault(query, set())
+                    self._resumed.add(query)
+                for _, _, time, after in cursors:
+                    if self.budget.request("search"):
+                        yield self._request(categories[0], query, after,
+                                            time=time)
+                    else:
+                        self._finish_partition(query, categories[0], time,
+                                               cursor=after)
+            position = self._storage.keyword_position()
+            pairs = islice(pairs, position, None)
+
+        while not self.budget.exhausted():
+            chunk = list(islice(pairs, self.keyword_batch_size))
+            if not chunk:
+                break
+            position += yield from self._add_pairs(chunk)
+
+        if self.budget.exhausted():
+            # palavras-chave a partir desta posição ficam para o resume
+            self.crawler.stats.set_value("budget/keyword_position", position)
+            self._storage.save_keyword_position(position)
+        else:
+            self._storage.save_keyword_position(0)
+
+    def _add_pairs(self, chunk):
+        """
+        Requisições de um bloco de pares (category, query).
+
+        Returns
+        -------
+        int
+            Quantidade de pares tratados antes do esgotamento do orçamento.
+
+        """
+        # inserindo category, queries e relações category-query inéditas
+        # no banco - coleções category, query e category_query
+        new_pairs = self._storage.add_category_queries(chunk)
+
+        # queries cuja busca já terminou nesta execução
+        queries = {q for _, q in chunk if q not in self._fanout}
+        searched = self._storage.searched_queries(queries, self._started)
+        # queries buscadas por completo há menos de fresh_ttl segundos
+        fresh = dict()
+        if self.fresh_ttl is not None:
+            fresh = self._storage.fresh_queries(queries, self.fresh_ttl)
+
+        position = 0
+        started = set()
+        for category, query in chunk:
+            if self.budget.exhausted():
+                break
+            position += 1
+
+            categories = self._fanout.get(query)
+            if categories is None and query in started:
+                # a busca da query terminou durante o bloco
+                searched.update(self._storage.searched_queries(
+                    [query], self._started))
+            if categories is None and query in searched:
+                # busca terminada: a nova category recebe os resultados
+                if searched[query] != category:
+                    self._fan_out(searched[query], category, query)
+            elif categories is None:
+                started.add(query)
+                if query not in fresh:
+                    self._fanout[query] = [category]
+                    yield from self._start(category, query)
+                    continue
+
+                # a nova category recebe os resultados já gravados
+                source = fresh[query]
+                if (category, query) in new_pairs and source not in [
+                        None, category]:
+                    self._fan_out(source, category, query)
+                if self.fresh_mode == "first_page":
+                    self._fanout[query] = [category]
+                    self.crawler.stats.inc_value("search/fresh_probed")
+                    yield from self._start(category, query, probe=True)
+                else:
+                    self.crawler.stats.inc_value("search/fresh_skipped")
+            elif category not in categories:
+                self._fan_out(categories[0], category, query)
+                categories.append(category)
+        return position
+
+    def _fan_out(self, source, category, query):
+        """
+        Replica para a category os resultados da query já gravados.
+
+        A replicação é registrada no arquivo de respostas, se houver, para
+        o reprocess (ver QArchive).
+        """
+        self.crawler.stats.inc_value("search/fanout_queries")
+        self._storage.copy_category_query(source, category, query)
+        self.crawler.signals.send_catch_log(category_fanout, spider=self,
+                                            query=query, source=source,
+                                            category=category)
+
+    def inject(self, pairs) -> int:
+        """
+        Adiciona pares (category, query) a uma busca em curso.
+
+        Os pares passam pelo mesmo tratamento das palavras-chave lidas no
+        start_requests e as requisições entram direto no engine do Scrapy
+        (ver QControl.ControlChannel).
+
+        Parameters
+        ----------
+        pairs : dict, str, Collection ou iterable
+            Fonte de pares aceita por QKeywords.keyword_pairs.
+
+        Returns
+        -------
+        int
+            Quantidade de requisições criadas.
+
+        """
+        requests = list(self._add_pairs(list(keyword_pairs(pairs))))
+        for request in requests:
+            self.crawler.engine.crawl(request)
+        return len(requests)
+
+    def _start(self, category, query, probe=False):
+        """
+        Requisições da primeira página da query, uma por filtro de tempo.
+
+        Os filtros que não couberem no orçamento têm o cursor gravado para o
+        resume.
+        """
+        self._open_partitions(query, len(self.time_partitions))
+        if len(self.time_partitions) > 1:
+            self._seen.setdefault(query, set())
+        for time in self.time_partitions:
+            if self.budget.request("search"):
+                yield self._request(category, query, after=-1, probe=probe,
+                                    time=time)
+            else:
+                self._finish_partition(query, category, time, cursor=-1)
+
+    def _open_partitions(self, query, count):
+        state = self._partitions.setdefault(query, [0, True])
+        state[0] += count
+
+    def _finish_partition(self, query, category, time, cursor=None,
+                          crawled=True):
+        """
+        Encerra a paginação de uma partição da query.
+
+        Parameters
+        ----------
+        query : str
+            Query buscada.
+        category : str
+            Category da requisição.
+        time : str
+            Filtro de tempo da partição.
+        cursor : int, optional
+            Cursor da próxima página, gravado quando a paginação é
+            interrompida pelo orçamento. The default is None.
+        crawled : bool, optional
+            Indica que a partição foi paginada até o fim. The default is
+            True.
+
+        Returns
+        -------
+        None.
+
+        """
+        # sem estado: página reprocessada do arquivo (ver QArchive)
+        state = self._partitions.setdefault(query, [1, True])
+        state[0] -= 1
+        if cursor is not None:
+            # orçamento esgotado: a partição fica para a próxima execução
+            self._storage.save_cursor(
+                query, self._fanout.get(query, [category]), cursor, time)
+            crawled = False
+        elif self.resume:
+            # a partição pode ter sido retomada de um cursor gravado
+            self._storage.clear_cursor(query, time)
+        state[1] = state[1] and crawled
+        if state[0] > 0:
+            return
+
+        del self._partitions[query]
+        self._seen.pop(query, None)
+        self._resumed.discard(query)
+        self._post_queries.discard(query)
+        # as próximas ocorrências da query são resolvidas pelo banco
+        self._storage.mark_searched(
+            query, self._fanout.pop(query, [category])[0])
+        if state[1]:
+            # busca completa: registrando para o fresh_ttl
+            self._storage.mark_crawled(query, category)
+
+    def _request(self, category, query, after, probe=False, pages=0,
+                 time=None):
+        """
+        Requisição da página de busca iniciada após o item after.
+
+        As sondagens do fresh_mode "first_page" não passam pelo cache HTTP
+        (ver QCache), que devolveria a página da busca anterior.
+        """
+        payload = dict(self.payload)
+        payload["variables"] = dict(self.payload["variables"],
+                                    after=str(after),
+                                    query=query,
+                                    resultType=self.result_type,
+                                    time=time or self.time_partitions[0])
+        return scrapy.http.JsonRequest(
+            url=self.url,
+            headers=self.headers,
+            data=payload,
+            cookies=self.cookies,
+            callback=self.parse,
+            meta={'template': 'search-page', 'dont_cache': probe},
+            errback=self.failed,
+            cb_kwargs={'query': query,
+                       'category': category,
+                       'after': after,
+                       'probe': probe,
+                       'pages': pages,
+                       'time': time or self.time_partitions[0]}
+        )
+
+    def parse(self, response, category, query, after=-1, probe=False,
+              pages=0, time=None):
         """
         Analisa o conteúdo de cada requisição.
 
@@ -154,88 +469,174 @@ class SearchSpider(scrapy.Spider):
             Categoria da Query buscada.
         query : str
             Query buscada.
+        after : int, optional
+            Cursor da página analisada. The default is -1.
+        probe : bool, optional
+            Indica a primeira página de uma query ainda válida (fresh_mode
+            "first_page"): a paginação só continua se a página tiver
+            resultados inéditos. The default is False.
+        pages : int, optional
+            Páginas da query já analisadas nesta execução. The default is 0.
+        time : str, optional
+            Filtro de tempo da partição. The default is None.
+
+        Yields
+        ------
+        scrapy.http.JsonRequest
+            Requisição da próxima página, se houver.
+
+        """
+        # a partição continua aberta até a página ser tratada; se o
+        # tratamento falhar, o cursor da página é gravado como no failed
+        end = None
+        try:
+            end = yield from self._parse_page(response, category, query,
+                                              after, probe, pages, time)
+        except Exception:
+            self.crawler.stats.inc_value("search/failed_pages")
+            end = {"cursor": after}
+            raise
+        finally:
+            if end is not None:
+                self._finish_partition(query, category, time, **end)
+
+    def _parse_page(self, response, category, query, after, probe, pages,
+                    time):
+        """
+        Grava os resultados de uma página de busca.
 
         Returns
         -------
-        None.
+        dict
+            Argumentos do _finish_partition da partição; None se a próxima
+            página foi requisitada.
 
         """
         result = response.json()
+        self.budget.page()
 
         searchConnection = result["data"]["searchConnection"]
 
         if searchConnection is not None:
             edges = searchConnection["edges"]
 
-            iteracao = (self._after + 1) // 10
-            for item in tqdm(edges,
-                             desc=f"Crawling {iteracao}: {category}: {query}"):
+            if probe or query in self._resumed:
+                # resultados da página que já estão no banco
+                results, stored = self._stored_results(category, query,
+                                                       edges)
+                has_new = len(stored) < len(results)
+                if query in self._resumed:
+                    self._seen[query].update(stored)
+
+            iteracao = (after + 1) // 10
+            for rank, item in enumerate(tqdm(
+                    edges, desc=f"Crawling {iteracao}: {category}: {query}"),
+                    start=after + 2):
                 tipo = item["node"]["searchResultType"]
-                url = "https://www.quora.com"
-
-                if tipo == "question":
-                    qid = item["node"][tipo]["qid"]
-                    url += item["node"][tipo]["url"]
-                    question = item["node"][tipo]
-                    question["_id"] = qid
-                    try:
-                        # inserindo relações category-query-question inéditas
-                        # no banco - coleção category_query_question
-                        self._db["category_query_qid"].insert_one(
-                            {"_id": f"{category}_{query}_{qid}",
-                             "category_query": f"{category}_{query}",
-                             "qid": qid}
-                        )
-                    except DuplicateKeyError:
-                        pass
-
-                    # Identificando questões não respondidas
-                    if url[:33] != "https://www.quora.com/unanswered/":
-                        try:
-                            # inserindo question respondida no banco para
-                            # posterior coleta de respostas - coleção tmp
-                            self._db["tmp"].insert_one({"category": category,
-                                                        "query": query,
-                                                        "_id": qid})
-                        except DuplicateKeyError:
-                            pass
-
-                    try:
-                        # inserindo questions inéditas no banco - coleção
-                        # questions
-                        self._db["questions"].insert_one(question)
-                    except DuplicateKeyError:
-                        pass
-                    
-                elif tipo == "topic":
-                    tid = item["node"][tipo]["tid"]
-                    url += item["node"][tipo]["url"]
-                    topic = item["node"][tipo]
-                    topic["_id"] = tid
-                    try:
-                        self._db["category_query_tid"].insert_one(
-                            {"_id": f"{category}_{query}_{tid}",
-                             "category_query": f"{category}_{query}",
-                             "tid": tid}
-                        )
-                    except DuplicateKeyError:
-                        pass
-
-                    try:
-                        # inserindo topics inéditas no banco
-                        self._db["topics"].insert_one(topic)
-                    except DuplicateKeyError:
-                        pass
+                key, field, _ = SEARCH_RESULT_TYPES.get(tipo, (tipo, None,
+                                                               None))
+                entity = item["node"].get(key)
+                if field is None or entity is None:
+                    self.crawler.stats.inc_value("search/unknown_results")
+                    continue
+                eid = entity[field]
+
+                if query in self._seen:
+                    # resultado já trazido por outra partição da query
+                    if (tipo, eid) in self._seen[query]:
+                        self.crawler.stats.inc_value(
+                            "search/partition_duplicates")
+                        continue
+                    self._seen[query].add((tipo, eid))
+
+                # inserindo a entidade e as relações category-query-entidade
+                # inéditas no banco, para cada category da query
+                entity["_id"] = eid
+                self.crawler.stats.inc_value(f"search/results/{tipo}")
+                for c in self._fanout.get(query, [category]):
+                    self._storage.add_result(c, query, tipo, entity)
+
+                if tipo == "post" and self.result_type != "post" and (
+                        query not in self._post_queries):
+                    # a busca restrita a postagens fica para a PostSpider
+                    self._post_queries.add(query)
+                    self._storage.writer.update(
+                        "post_queue", {"_id": query},
+                        {"$addToSet": {"categories": {
+                            "$each": self._fanout.get(query, [category])}}},
+                        upsert=True)
+
+                # Identificando questões não respondidas
+                url = "https://www.quora.com" + entity.get("url", "")
+                if tipo == "question" and (
+                        url[:33] != "https://www.quora.com/unanswered/"):
+                    # inserindo question respondida no banco para
+                    # posterior coleta de respostas - coleção tmp,
+                    # com os sinais usados na prioridade da coleta
+                    self._storage.writer.insert(
+                        "tmp", {"category": category,
+                                "query": query,
+                                "_id": eid,
+                                "followerCount": entity.get(
+                                    "followerCount"),
+                                "numDisplayComments": entity.get(
+                                    "numDisplayComments"),
+                                "rank": rank})
 
             hasNextPage = searchConnection["pageInfo"].get("hasNextPage",
                                                            False)
+            if probe and not has_new:
+                # a query continua válida: nada de novo na primeira página
+                return {"crawled": False}
             if not hasNextPage:
-                # indica que não há próxima página
-                self.hasNextPage[query] = False
+                return {}
+            if self.budget.request("search", pages + 1):
+                # Gerando a request da próxima página
+                yield self._request(category, query, after + 10,
+                                    pages=pages + 1, time=time)
+                return None
+            return {"cursor": after + 10}
+        return {"crawled": False}
+
+    def _stored_results(self, category, query, edges) -> tuple:
+        """
+        Resultados de uma página e os já relacionados ao par category-query.
+
+        Returns
+        -------
+        tuple
+            (resultados, gravados): conjuntos de pares (tipo, id).
 
-            # Atualizando atributo da próxima request
-            self._after += 10
-            self.payload["variables"]["after"] = str(self._after)
+        """
+        results, stored = set(), set()
+        for tipo, (key, field, _) in SEARCH_RESULT_TYPES.items():
+            ids = [item["node"][key][field] for item in edges
+                   if item["node"]["searchResultType"] == tipo
+                   and item["node"].get(key) is not None]
+            if not ids:
+                continue
+            results.update((tipo, eid) for eid in ids)
+            stored.update((tipo, eid) for eid in self._storage.known_ids(
+                category, query, field, ids))
+        return results, stored
+
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
+
+        O cursor da página que falhou é gravado como nas interrupções do
+        orçamento, para que a partição seja retomada com resume.
+        """
+        kwargs = failure.request.cb_kwargs
+        self.crawler.stats.inc_value("search/failed_pages")
+        self._finish_partition(kwargs["query"], kwargs["category"],
+                               kwargs["time"], cursor=kwargs["after"])
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes ao final da coleta."""
+        self._storage.close(self.crawler.stats)
+        self.budget.finish("queries", self._db["query"].count_documents(
+            {"cursor": {"$exists": True}}), self.crawler.stats)
 
 
 ###############################################################################
@@ -245,11 +646,25 @@ class AnswerSpider(scrapy.Spider):
     name = 'quora_answer_spider'
 
     custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
         'DOWNLOAD_DELAY': 0.05,
         'CONCURRENT_REQUESTS': 5,
     }
 
-    def __init__(self, requests_params: dict, client: MongoClient):
+    # documentos da fila tmp trazidos do MongoDB por vez
+    queue_batch_size = 1000
+
+    # campos da fila tmp lidos pelo start_requests e pela prioridade
+    queue_projection = {"_id": 1, "priority": 1, "category": 1, "query": 1,
+                        "after": 1, "count": 1, "followerCount": 1,
+                        "numDisplayComments": 1, "rank": 1}
+
+    def __init__(self, requests_params: dict, client: MongoClient,
+                 storage_options: dict = None, priority=None,
+                 budget: CrawlBudget = None,
+                 database: str = "quora_database", prefix: str = ""):
         """
         Inicializa a instância de coleta de perguntas.
 
@@ -259,6 +674,22 @@ class AnswerSpider(scrapy.Spider):
             Parâmetros de coleta de dados.
         client : MongoClient
             Cliente do MongoDB.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage). The default
+            is None.
+        priority : callable, optional
+            Função que recebe o documento da fila tmp (campos de
+            queue_projection), acrescido do campo answers da última visita,
+            e devolve a prioridade (int) das requisições da pergunta. The
+            default is None, que usa QScheduler.question_priority.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo, compartilhado com as
+            demais spiders da execução. The default is None, sem limite.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
 
         Raises
         ------
@@ -272,7 +703,11 @@ class AnswerSpider(scrapy.Spider):
         """
         super().__init__()
 
-        self._db = client["quora_database"]
+        self._db = Namespace(client, database, prefix)
+        self._storage = Storage(self._db, **(storage_options or {}))
+        self._revisits = RevisitPolicy(self._db, self._storage.writer)
+        self.priority = priority or question_priority
+        self.budget = budget if budget is not None else CrawlBudget()
 
         try:
             self.url = requests_params['question-page']['url']
@@ -290,44 +725,86 @@ class AnswerSpider(scrapy.Spider):
         É utilizado um banco intermediário chamado tmp para armazenar as
         perguntas que foram coletadas. Esse banco é lido e assim sabe-se qual
         pergunta precisa de coleta de respostas.
+
+        A fila é lida em blocos de queue_batch_size perguntas. Cada bloco é
+        ordenado pela prioridade de suas perguntas, que também é atribuída às
+        requisições, para que a fila de prioridades do Scrapy pagine primeiro
+        as perguntas mais produtivas.
+
+        Cada pergunta sai da fila quando sua paginação termina. Esgotado o
+        orçamento, as perguntas restantes e o cursor (after) das paginações
+        interrompidas permanecem no tmp para a próxima execução.
         """
         # Esta definição do tmp deve vir aqui, não colocá-la no init!
-        tmp = self._db["tmp"].find()
-        tmp = [line for line in tmp]
-
-        self.hasNextPage = dict()
-        for line in tqdm(tmp, desc="Lendo bd.tmp:"):
-            category = line.get("category", "General")
-            query = line.get("query")
-            qid = line.get("_id")
-            self.hasNextPage[qid] = True
-            self._after = -1
-            self.payload["variables"]["after"] = str(self._after)
-            self.payload["variables"]["qid"] = qid
-
-            while True:
-                yield scrapy.http.JsonRequest(
-                    url=self.url,
-                    headers=self.headers,
-                    data=self.payload,
-                    cookies=self.cookies,
-                    callback=self.parse,
-                    cb_kwargs={'qid': qid,
-                               'query': query,
-                               'category': category}
-                )
-                if not self.hasNextPage[qid]:
+        # A fila é lida sob demanda, sem carregá-la inteira na memória.
+        tmp = stream(self._db["tmp"], projection=self.queue_projection,
+                     batch_size=self.queue_batch_size)
+        total = self._db["tmp"].estimated_document_count()
+        tmp = tqdm(tmp, total=total, desc="Lendo bd.tmp:")
+
+        while not self.budget.exhausted():
+            chunk = list(islice(tmp, self.queue_batch_size))
+            if not chunk:
+                break
+
+            # respostas encontradas na última visita de cada pergunta
+            answers = self._revisits.answer_counts(
+                [line["_id"] for line in chunk])
+            for line in chunk:
+                line["answers"] = answers.get(line["_id"])
+                line["priority"] = self.priority(line)
+            chunk.sort(key=lambda line: line["priority"], reverse=True)
+
+            for line in chunk:
+                if not self.budget.request("answer"):
                     break
+                category = line.get("category", "General")
+                yield self._request(category, line.get("query"),
+                                    line.get("_id"),
+                                    after=line.get("after", -1),
+                                    count=line.get("count", 0),
+                                    priority=line["priority"],
+                                    revisit=line["answers"] is not None)
+
+    def _request(self, category, query, qid, after=-1, count=0,
+                 priority=0, pages=0, revisit=False):
+        """
+        Requisição de uma página de respostas da pergunta qid.
 
-        try:
-            self._db["tmp"].drop()
-        except Exception as e:
-            print(e)
-
-    def parse(self, response, category, query, qid):
+        As revisitas (perguntas com visita registrada na RevisitPolicy) não
+        passam pelo cache HTTP (ver QCache), para que a quantidade de
+        respostas registrada seja a atual.
+        """
+        payload = dict(self.payload)
+        payload["variables"] = dict(self.payload["variables"],
+                                    after=str(after), qid=qid)
+        return scrapy.http.JsonRequest(
+            url=self.url,
+            headers=self.headers,
+            data=payload,
+            cookies=self.cookies,
+            callback=self.parse,
+            meta={'template': 'question-page', 'dont_cache': revisit},
+            errback=self.failed,
+            priority=priority,
+            cb_kwargs={'qid': qid,
+                       'query': query,
+                       'category': category,
+                       'after': after,
+                       'count': count,
+                       'pages': pages}
+        )
+
+    def parse(self, response, category, query, qid, after=-1, count=0,
+              pages=0):
         """
         Tratamento de dados da requisição.
 
+        Ao final da paginação, a quantidade de respostas da pergunta é
+        registrada na política de revisita (QScheduler.RevisitPolicy).
+        Perguntas removidas ou mescladas (question nula) recebem gone_at em
+        questions e saem da fila tmp e das revisitas.
+
         Parameters
         ----------
         response : requests.Response
@@ -338,18 +815,37 @@ class AnswerSpider(scrapy.Spider):
             Query utilizada.
         qid : int
             Identificação da questão dentro do sistema do Quora.
-
-        Returns
-        -------
-        None.
+        after : int, optional
+            Cursor da página requisitada. The default is -1.
+        count : int, optional
+            Respostas encontradas nas páginas anteriores. The default is 0.
+        pages : int, optional
+            Páginas da pergunta já analisadas nesta execução. The default is
+            0.
+
+        Yields
+        ------
+        scrapy.http.JsonRequest
+            Requisição da próxima página, se houver.
 
         """
         result = response.json()
-        pagedListDataConnection = result["data"]["question"][
-            "pagedListDataConnection"]
+        self.budget.page()
+        question = result["data"].get("question") or dict()
+        pagedListDataConnection = question.get("pagedListDataConnection")
+        if pagedListDataConnection is None:
+            # pergunta removida ou mesclada
+            self.crawler.stats.inc_value("answer/gone")
+            self._storage.writer.update(
+                "questions", {"_id": qid},
+                {"$set": {"gone_at": datetime.utcnow()}})
+            self._storage.writer.delete("tmp", {"_id": qid})
+            self._revisits.forget(qid)
+            return
         edges = pagedListDataConnection["edges"]
 
-        iteracao = (self._after + 1) // 12
+        iteracao = (after + 1) // 12
+        answers = []
         for item in tqdm(edges,
                          desc=f"Parsing {iteracao} Answers of {qid}"):
             # pulando o que não é resposta
@@ -360,165 +856,1175 @@ class AnswerSpider(scrapy.Spider):
                 continue
 
             answer = item["node"]["answer"]
-            aid = answer["aid"]
-            answer['_id'] = aid
-
-            try:
-                # Inserindo relações question-answer inéditas no banco -
-                # coleção question_answer
-                self._db["question_answer"].insert_one(
-                    {"_id": f"{qid}_{aid}",
-                     "qid": qid,
-                     "aid": aid}
-                )
-            except DuplicateKeyError:
-                pass
-
-            try:
-                # inserindo answers inéditas no banco - coleção answers
-                self._db["answers"].insert_one(answer)
-            except DuplicateKeyError:
-                pass
+            answer['_id'] = answer["aid"]
+            answers.append(answer)
+
+        # inserindo answers e relações question-answer inéditas no banco
+        self._storage.add_answers(qid, answers)
 
+        count += len(answers)
         hasNextPage = pagedListDataConnection["pageInfo"].get("hasNextPage",
                                                               False)
         if not hasNextPage:
-            # Indica que não existe próxima página
-            self.hasNextPage[qid] = False
+            self._revisits.record(qid, count, category, query)
+            self._storage.writer.delete("tmp", {"_id": qid})
+        elif self.budget.request("answer", pages + 1):
+            # after1 = first*n + after0
+            yield self._request(category, query, qid, after + 12, count,
+                                priority=response.request.priority,
+                                pages=pages + 1,
+                                revisit=response.meta.get("dont_cache",
+                                                          False))
+        else:
+            # orçamento esgotado: a pergunta continua na fila com o cursor
+            self._storage.writer.update("tmp", {"_id": qid},
+                                        {"$set": {"after": after + 12,
+                                                  "count": count}})
 
-        # Atualizando atributo da próxima request
-        self._after += 12  # after1 = first*n + after0
-        self.payload["variables"]["after"] = str(self._after)
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
+
+        A pergunta continua na fila tmp com o cursor da página que falhou.
+        """
+        kwargs = failure.request.cb_kwargs
+        self.crawler.stats.inc_value("answer/failed_pages")
+        self._storage.writer.update("tmp", {"_id": kwargs["qid"]},
+                                    {"$set": {"after": kwargs["after"],
+                                              "count": kwargs["count"]}})
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes ao final da coleta."""
+        self._storage.close(self.crawler.stats)
+        self.budget.finish("questions", self._db["tmp"].count_documents({}),
+                           self.crawler.stats)
 
 ###############################################################################
 class TopicSpider(scrapy.Spider):
-    """Classe de coleta de dados de respostas da página de uma pergunta."""
+    """Classe de coleta do feed de histórias dos tópicos."""
 
     name = 'quora_topic_spider'
 
     custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
         'DOWNLOAD_DELAY': 0.05,
         'CONCURRENT_REQUESTS': 5,
     }
 
-    def __init__(self, requests_params: dict, client: MongoClient):
+    # documentos da coleção topics trazidos do MongoDB por vez
+    queue_batch_size = 1000
+
+    # cursor da primeira página do feed (multifeedAfter)
+    first_cursor = "-1"
+
+    def __init__(self, requests_params: dict, client: MongoClient,
+                 storage_options: dict = None, budget: CrawlBudget = None,
+                 database: str = "quora_database", prefix: str = ""):
+        """
+        Inicializa a instância de coleta dos feeds de tópicos.
+
+        Os tópicos são lidos da coleção topics, preenchida pela SearchSpider,
+        e o feed de cada um é paginado pela MultifeedQuery, encadeando o
+        cursor (multifeedAfter) e a quantidade de blocos já recebidos
+        (multifeedNumBundlesOnClient) de uma requisição para a seguinte.
+        Vários tópicos são paginados ao mesmo tempo.
+
+        Parameters
+        ----------
+        requests_params : dict
+            Parâmetros de coleta de dados, com a chave "topic-page".
+        client : MongoClient
+            Cliente do MongoDB.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage). The default
+            is None.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo; o limite de páginas
+            por tópico é o topic_pages. The default is None, sem limite.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o requests_params seja definido fora dos padrões.
+
+        Returns
+        -------
+        None.
+
+        """
         super().__init__()
 
-        self._db = client["quora_database"]
+        self._db = Namespace(client, database, prefix)
+        self._storage = Storage(self._db, **(storage_options or {}))
+        self.budget = budget if budget is not None else CrawlBudget()
 
         try:
-            self.url = requests_params['question-page']['url']
-            self.headers = requests_params['question-page']['headers']
-            self.payload = requests_params['question-page']['payload']
-            self.cookies = requests_params['question-page']['cookies']
-            self.headers['user-agent'] += str(requests_params['user-agent'])
+            self.url = requests_params['topic-page']['url']
+            self.headers = requests_params['topic-page']['headers']
+            self.payload = requests_params['topic-page']['payload']
+            self.cookies = requests_params['topic-page']['cookies']
+            self.headers['user-agent'] = (
+                self.headers.get('user-agent', '')
+                + str(requests_params['user-agent']))
         except Exception:
             raise ValueError("Verifique o arquivo de parâmetros.")
-    
-    
-    
+
+    def start_requests(self):
+        """
+        Início da requisição do Scrapy.
+
+        Cada tópico gera a requisição da primeira página do seu feed, ou da
+        página em que a coleta anterior foi interrompida (campo feed_cursor);
+        as páginas seguintes são geradas pelo parse.
+        """
+        topics = stream(self._db["topics"],
+                        projection={"url": 1, "feed_cursor": 1},
+                        batch_size=self.queue_batch_size)
+        total = self._db["topics"].estimated_document_count()
+
+        for topic in tqdm(topics, total=total, desc="Lendo bd.topics:"):
+            if not self.budget.request("topic"):
+                break
+            cursor = topic.get("feed_cursor") or dict()
+            yield self._request(topic["_id"], topic.get("url", ""),
+                                after=cursor.get("after", self.first_cursor),
+                                bundles=cursor.get("bundles", 0))
+
+    def _request(self, tid, url, after, bundles=0, pages=0):
+        """Requisição de uma página do feed do tópico tid."""
+        payload = dict(self.payload)
+        payload["variables"] = dict(self.payload["variables"],
+                                    multifeedAfter=str(after),
+                                    multifeedNumBundlesOnClient=bundles,
+                                    pageData=str(tid))
+        return scrapy.http.JsonRequest(
+            url=self.url,
+            headers=dict(self.headers,
+                         Referer=f"https://www.quora.com{url}"),
+            data=payload,
+            cookies=self.cookies,
+            callback=self.parse,
+            meta={'template': 'topic-page'},
+            errback=self.failed,
+            cb_kwargs={'tid': tid,
+                       'url': url,
+                       'after': str(after),
+                       'bundles': bundles,
+                       'pages': pages}
+        )
+
+    def parse(self, response, tid, url, after=None, bundles=0, pages=0):
+        """
+        Tratamento de dados da requisição.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Resposta da requisição.
+        tid : int
+            Identificação do tópico dentro do sistema do Quora.
+        url : str
+            Caminho da página do tópico.
+        after : str, optional
+            Cursor da página analisada. The default is None.
+        bundles : int, optional
+            Blocos do feed recebidos nas páginas anteriores. The default
+            is 0.
+        pages : int, optional
+            Páginas do feed já analisadas nesta execução. The default is 0.
+
+        Yields
+        ------
+        scrapy.http.JsonRequest
+            Requisição da próxima página, se houver.
+
+        """
+        result = response.json()
+        self.budget.page()
+
+        multifeedObject = result["data"].get("multifeedObject") or dict()
+        connection = multifeedObject.get("multifeedConnection")
+        if connection is None:
+            return
+        edges = connection["edges"]
+
+        stories = [item["node"] for item in edges
+                   if (item.get("node") or dict()).get("id") is not None]
+        # inserindo histórias inéditas do feed no banco - coleção
+        # feed_stories
+        self._storage.add_feed_stories(tid, stories)
+        self.crawler.stats.inc_value("topic/stories", len(stories))
+
+        pageInfo = connection["pageInfo"]
+        bundles += len(edges)
+        if not pageInfo.get("hasNextPage", False) or not edges:
+            self._storage.save_feed_cursor(tid, None)
+        elif self.budget.request("topic", pages + 1):
+            yield self._request(tid, url, pageInfo["endCursor"], bundles,
+                                pages + 1)
+        else:
+            # orçamento esgotado: o feed continua na próxima execução
+            self._storage.save_feed_cursor(
+                tid, {"after": pageInfo["endCursor"], "bundles": bundles})
+
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
+
+        O cursor da página que falhou é gravado como nas interrupções do
+        orçamento, para que o feed continue dela na próxima execução.
+        """
+        kwargs = failure.request.cb_kwargs
+        self.crawler.stats.inc_value("topic/failed_pages")
+        self._storage.save_feed_cursor(kwargs["tid"],
+                                       {"after": kwargs["after"],
+                                        "bundles": kwargs["bundles"]})
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes ao final da coleta."""
+        self._storage.close(self.crawler.stats)
+        self.budget.finish("topics", self._db["topics"].count_documents(
+            {"feed_cursor": {"$exists": True}}), self.crawler.stats)
+
+
 class PostSpider(scrapy.Spider):
-    """Classe de coleta de dados de respostas da página de uma pergunta."""
+    """Classe de coleta das postagens encontradas para cada query."""
 
-    name = 'quora_topic_spider'
+    name = 'quora_post_spider'
 
     custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
         'DOWNLOAD_DELAY': 0.05,
         'CONCURRENT_REQUESTS': 5,
     }
 
-    def __init__(self, requests_params: dict, client: MongoClient):
+    # documentos da fila post_queue trazidos do MongoDB por vez
+    queue_batch_size = 1000
+
+    def __init__(self, requests_params: dict, client: MongoClient,
+                 storage_options: dict = None, budget: CrawlBudget = None,
+                 database: str = "quora_database", prefix: str = ""):
+        """
+        Inicializa a instância de coleta de postagens.
+
+        A fila post_queue é preenchida pela SearchSpider com as queries em
+        cuja busca apareceram postagens. Para cada uma, a busca restrita a
+        postagens (template "post-page", resultType "post") é paginada por
+        completo, e as postagens são gravadas na coleção posts e
+        relacionadas às categories da query (category_query_pid).
+
+        Parameters
+        ----------
+        requests_params : dict
+            Parâmetros de coleta de dados, com a chave "post-page".
+        client : MongoClient
+            Cliente do MongoDB.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage). The default
+            is None.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo. The default is None,
+            sem limite.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o requests_params seja definido fora dos padrões.
+
+        Returns
+        -------
+        None.
+
+        """
         super().__init__()
 
-        self._db = client["quora_database"]
+        self._db = Namespace(client, database, prefix)
+        self._storage = Storage(self._db, **(storage_options or {}))
+        self.budget = budget if budget is not None else CrawlBudget()
 
         try:
-            self.url = requests_params['question-page']['url']
-            self.headers = requests_params['question-page']['headers']
-            self.payload = requests_params['question-page']['payload']
-            self.cookies = requests_params['question-page']['cookies']
-            self.headers['user-agent'] += str(requests_params['user-agent'])
+            self.url = requests_params['post-page']['url']
+            self.headers = requests_params['post-page']['headers']
+            self.payload = requests_params['post-page']['payload']
+            self.cookies = requests_params['post-page']['cookies']
+            self.headers['user-agent'] = (
+                self.headers.get('user-agent', '')
+                + str(requests_params['user-agent']))
         except Exception:
             raise ValueError("Verifique o arquivo de parâmetros.")
 
+        self._db["category_query"].create_index("query")
+
     def start_requests(self):
-        posts = self._db["posts"].find()
-        posts = [line for line in posts]
-
-        self.hasNextPage = dict()
-        for line in tqdm(posts, desc="Lendo bd.tmp:"):
-            category = line.get("category", "General")
-            query = line.get("query")
-            tid = line.get("_id")
-            self.hasNextPage[tid] = True
-            self._after = 0
-            self.payload["variables"]["multifeedNumBundlesOnClient"] = str(self._after)
-            self.payload["variables"]["pagedata"] = tid
-
-            while True:
-                print("Pegando POSTS")
-                yield scrapy.http.JsonRequest(
-                    url=self.url,
-                    headers=self.headers,
-                    data=self.payload,
-                    cookies=self.cookies,
-                    callback=self.parse,
-                    cb_kwargs={'qid': tid,
-                               'query': query,
-                               'category': category}
-                )
-                if not self.hasNextPage[tid]:
-                    break
+        """
+        Início da requisição do Scrapy.
 
-        try:
-            self._db["tmp"].drop()
-        except Exception as e:
-            print(e)
+        Cada query da fila post_queue gera a requisição da primeira página,
+        ou da página em que a coleta anterior foi interrompida (campo after);
+        as páginas seguintes são geradas pelo parse. A query sai da fila
+        quando sua paginação termina. As categories das queries são
+        consultadas uma vez por bloco de queue_batch_size queries.
+        """
+        queue = stream(self._db["post_queue"],
+                       batch_size=self.queue_batch_size)
+        total = self._db["post_queue"].estimated_document_count()
+        queue = tqdm(queue, total=total, desc="Lendo bd.post_queue:")
+
+        while not self.budget.exhausted():
+            chunk = list(islice(queue, self.queue_batch_size))
+            if not chunk:
+                break
+            # categories atuais das queries do bloco, inclusive as que
+            # apareceram depois de elas entrarem na fila
+            categories = dict()
+            for cq in self._db["category_query"].find(
+                    {"query": {"$in": [line["_id"] for line in chunk]}},
+                    {"category": 1, "query": 1}):
+                categories.setdefault(cq["query"], []).append(
+                    cq["category"])
+
+            for line in chunk:
+                if not self.budget.request("post"):
+                    return
+                yield self._request(line["_id"],
+                                    categories.get(line["_id"])
+                                    or line["categories"],
+                                    after=line.get("after", -1))
+
+    def _request(self, query, categories, after=-1, pages=0):
+        """Requisição da página de postagens iniciada após o item after."""
+        payload = dict(self.payload)
+        payload["variables"] = dict(self.payload["variables"],
+                                    after=str(after),
+                                    query=query,
+                                    resultType="post")
+        return scrapy.http.JsonRequest(
+            url=self.url,
+            headers=self.headers,
+            data=payload,
+            cookies=self.cookies,
+            callback=self.parse,
+            meta={'template': 'post-page'},
+            errback=self.failed,
+            cb_kwargs={'query': query,
+                       'categories': categories,
+                       'after': after,
+                       'pages': pages}
+        )
+
+    def parse(self, response, query, categories, after=-1, pages=0):
+        """
+        Tratamento de dados da requisição.
 
-    def parse(self, response, category, query, qid):
+        Parameters
+        ----------
+        response : requests.Response
+            Resposta da requisição.
+        query : str
+            Query buscada.
+        categories : list
+            Categories da query.
+        after : int, optional
+            Cursor da página analisada. The default is -1.
+        pages : int, optional
+            Páginas da query já analisadas nesta execução. The default is 0.
+
+        Yields
+        ------
+        scrapy.http.JsonRequest
+            Requisição da próxima página, se houver.
+
+        """
         result = response.json()
-        pagedListDataConnection = result["data"]["question"][
-            "pagedListDataConnection"]
-        edges = pagedListDataConnection["edges"]
+        self.budget.page()
 
-        iteracao = (self._after + 1) // 12
-        for item in tqdm(edges,
-                         desc=f"Parsing {iteracao} Answers of {qid}"):
-            # pulando o que não é resposta
-            if "answer" not in item["node"]:
-                continue
-            # QuestionAnswerItem2 -> é uma resposta da pergunta em específico
-            if item["node"]["__typename"] != "QuestionAnswerItem2":
+        searchConnection = result["data"]["searchConnection"]
+        if searchConnection is None:
+            return
+
+        key, field, _ = SEARCH_RESULT_TYPES["post"]
+        iteracao = (after + 1) // 10
+        for item in tqdm(searchConnection["edges"],
+                         desc=f"Parsing {iteracao} Posts of {query}"):
+            post = item["node"].get(key)
+            if item["node"]["searchResultType"] != "post" or post is None:
                 continue
+            post["_id"] = post[field]
+            # inserindo posts e relações category-query-post inéditas no
+            # banco, para cada category da query
+            for category in categories:
+                self._storage.add_result(category, query, "post", post)
+
+        hasNextPage = searchConnection["pageInfo"].get("hasNextPage",
+                                                       False)
+        if not hasNextPage:
+            self._storage.writer.delete("post_queue", {"_id": query})
+        elif self.budget.request("post", pages + 1):
+            yield self._request(query, categories, after + 10, pages + 1)
+        else:
+            # orçamento esgotado: a query continua na fila com o cursor
+            self._storage.writer.update("post_queue", {"_id": query},
+                                        {"$set": {"after": after + 10}})
 
-            answer = item["node"]["answer"]
-            aid = answer["aid"]
-            answer['_id'] = aid
-
-            try:
-                # Inserindo relações question-answer inéditas no banco -
-                # coleção question_answer
-                self._db["quest ion_answer"].insert_one(
-                    {"_id": f"{qid}_{aid}",
-                     "qid": qid,
-                     "aid": aid}
-                )
-            except DuplicateKeyError:
-                pass
-
-            try:
-                # inserindo answers inéditas no banco - coleção answers
-                self._db["answers"].insert_one(answer)
-            except DuplicateKeyError:
-                pass
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
 
-        hasNextPage = pagedListDataConnection["pageInfo"].get("hasNextPage",
-                                                              False)
-        if not hasNextPage:
-            # Indica que não existe próxima página
-            self.hasNextPage[qid] = False
+        A query continua na fila post_queue com o cursor da página que
+        falhou.
+        """
+        kwargs = failure.request.cb_kwargs
+        self.crawler.stats.inc_value("post/failed_pages")
+        self._storage.writer.update("post_queue", {"_id": kwargs["query"]},
+                                    {"$set": {"after": kwargs["after"]}})
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes ao final da coleta."""
+        self._storage.close(self.crawler.stats)
+        self.budget.finish("post_queries",
+                           self._db["post_queue"].count_documents({}),
+                           self.crawler.stats)
+
+
+###############################################################################
+class ProfileSpider(scrapy.Spider):
+    """Classe de coleta dos perfis dos autores de respostas e perguntas."""
+
+    name = 'quora_profile_spider'
+
+    custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
+        'DOWNLOAD_DELAY': 0.05,
+        'CONCURRENT_REQUESTS': 10,
+    }
+
+    # novos uids agendados a cada vez que a spider fica ociosa
+    idle_batch_size = 1000
+
+    # atraso, em segundos, da marca d'água em relação ao início da leitura:
+    # answers e questions com crawled_at anterior podem ainda estar no
+    # BulkWriter de outra coleta e ser gravadas depois da leitura
+    watermark_lag = 3600
+
+    def __init__(self, requests_params: dict, client: MongoClient,
+                 storage_options: dict = None, ttl: float = 30 * 86400,
+                 budget: CrawlBudget = None,
+                 database: str = "quora_database", prefix: str = ""):
+        """
+        Inicializa a instância de coleta de perfis.
+
+        A fronteira de uids é formada pelos autores das answers
+        (author.uid) e das questions (asker.uid) gravadas desde a coleta
+        anterior, mais os usuários cujo perfil expirou. Os uids já vistos
+        ficam em um QFrontier.UidSet, e perfis coletados há menos de ttl
+        segundos não são coletados de novo. Enquanto novas answers chegam ao
+        banco, a spider ociosa amplia a fronteira em vez de encerrar.
+
+        Parameters
+        ----------
+        requests_params : dict
+            Parâmetros de coleta de dados, com a chave "profile-page", cujo
+            payload recebe a variável uid.
+        client : MongoClient
+            Cliente do MongoDB.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage). The default
+            is None.
+        ttl : float, optional
+            Validade, em segundos, de um perfil coletado. The default is 30
+            dias.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo. The default is None,
+            sem limite.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o requests_params seja definido fora dos padrões.
+
+        Returns
+        -------
+        None.
+
+        """
+        super().__init__()
+
+        self._db = Namespace(client, database, prefix)
+        self._storage = Storage(self._db, **(storage_options or {}))
+        self.budget = budget if budget is not None else CrawlBudget()
+        self.ttl = ttl
+
+        try:
+            self.url = requests_params['profile-page']['url']
+            self.headers = requests_params['profile-page']['headers']
+            self.payload = requests_params['profile-page']['payload']
+            self.cookies = requests_params['profile-page']['cookies']
+            self.headers['user-agent'] = (
+                self.headers.get('user-agent', '')
+                + str(requests_params['user-agent']))
+        except Exception:
+            raise ValueError("Verifique o arquivo de parâmetros.")
+
+        for collection in ("answers", "questions"):
+            self._db[collection].create_index("crawled_at")
+
+        # perfis ainda válidos não entram na fronteira
+        self._cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        self._known = UidSet(doc["_id"] for doc in stream(
+            self._db["users"], {"fetched_at": {"$gte": self._cutoff}},
+            {"_id": 1}))
 
-        # Atualizando atributo da próxima request
-        self._after += 12  # after1 = first*n + after0
-        self.payload["variables"]["after"] = str(self._after)
+        doc = self._db["metadata"].find_one({"_id": "profile_watermark"})
+        self._since = doc["since"] if doc is not None else None
+        self._frontier = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        """Conecta o sinal spider_idle, que amplia a fronteira."""
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_idle,
+                                signal=scrapy.signals.spider_idle)
+        return spider
+
+    def _scan(self, stale=False):
+        """
+        Uids inéditos da fronteira, gerados sob demanda.
+
+        Os uids novos são gravados em users sem fetched_at antes de serem
+        agendados; se a requisição do perfil for descartada, a leitura dos
+        perfis expirados da próxima coleta os encontra.
+
+        Parameters
+        ----------
+        stale : bool, optional
+            Inclui os usuários cujo perfil expirou ou nunca foi coletado.
+            The default is False.
+
+        Yields
+        ------
+        int
+            Uid ainda não visto nesta execução.
 
+        """
+        # a marca d'água avança somente ao final de uma leitura completa;
+        # os registros pendentes no writer desta spider são gravados antes
+        self._storage.writer.flush()
+        started = datetime.utcnow()
+        if stale:
+            for doc in stream(self._db["users"],
+                              {"$or": [{"fetched_at": {"$lt": self._cutoff}},
+                                       {"fetched_at": {"$exists": False}}]},
+                              {"_id": 1}):
+                if self._known.add(doc["_id"]):
+                    yield doc["_id"]
+
+        since = dict() if self._since is None else {
+            "crawled_at": {"$gt": self._since}}
+        for collection, field in (("answers", "author"),
+                                  ("questions", "asker")):
+            for doc in stream(self._db[collection], since,
+                              {f"{field}.uid": 1}):
+                uid = (doc.get(field) or dict()).get("uid")
+                if uid is not None and self._known.add(uid):
+                    self._storage.writer.update(
+                        "users", {"_id": uid},
+                        {"$setOnInsert": {"queued_at": started}},
+                        upsert=True)
+                    yield uid
+        self._since = started - timedelta(seconds=self.watermark_lag)
+
+    def start_requests(self):
+        """Início da requisição do Scrapy."""
+        self._frontier = self._scan(stale=True)
+        for uid in self._frontier:
+            if not self.budget.request("profile"):
+                return
+            yield self._request(uid)
+        self._frontier = None
+
+    def spider_idle(self):
+        """
+        Agenda os autores de answers e questions gravadas durante a coleta.
+
+        Raises
+        ------
+        DontCloseSpider
+            Enquanto houver uids novos na fronteira.
+
+        """
+        if self.budget.exhausted():
+            return
+        if self._frontier is None:
+            # a leitura anterior terminou: nova leitura desde a marca d'água
+            self._frontier = self._scan()
+
+        scheduled = 0
+        for uid in islice(self._frontier, self.idle_batch_size):
+            if not self.budget.request("profile"):
+                return
+            self.crawler.engine.crawl(self._request(uid))
+            scheduled += 1
+        if scheduled < self.idle_batch_size:
+            self._frontier = None
+        if scheduled:
+            raise scrapy.exceptions.DontCloseSpider
+
+    def _request(self, uid):
+        """Requisição do perfil do usuário uid."""
+        payload = dict(self.payload)
+        payload["variables"] = dict(self.payload["variables"], uid=uid)
+        return scrapy.http.JsonRequest(
+            url=self.url,
+            headers=self.headers,
+            data=payload,
+            cookies=self.cookies,
+            callback=self.parse,
+            meta={'template': 'profile-page'},
+            errback=self.failed,
+            cb_kwargs={'uid': uid}
+        )
+
+    def parse(self, response, uid):
+        """
+        Tratamento de dados da requisição.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Resposta da requisição.
+        uid : int
+            Identificação do usuário dentro do sistema do Quora.
+
+        Returns
+        -------
+        None.
+
+        """
+        result = response.json()
+        self.budget.page()
+
+        user = result["data"].get("user")
+        if user is None:
+            # perfil removido: revisitado somente após o ttl
+            self.crawler.stats.inc_value("profile/missing")
+            self._storage.add_user({"_id": uid, "missing": True})
+            return
+        user["_id"] = uid
+        # gravando o perfil no banco - coleção users
+        self._storage.add_user(user)
+        self.crawler.stats.inc_value("profile/fetched")
+
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
+
+        O usuário continua em users sem fetched_at e entra na fronteira da
+        próxima coleta.
+        """
+        self.crawler.stats.inc_value("profile/failed")
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes e grava a marca d'água."""
+        self._storage.close(self.crawler.stats)
+        self.crawler.stats.set_value("profile/frontier_size",
+                                     len(self._known))
+        if self._frontier is None and self._since is not None:
+            # todas as leituras da fronteira foram agendadas
+            self._db["metadata"].update_one(
+                {"_id": "profile_watermark"},
+                {"$set": {"since": self._since}}, upsert=True)
+        self.budget.finish("profiles", self._db["users"].count_documents(
+            {"$or": [{"fetched_at": {"$lt": self._cutoff}},
+                     {"fetched_at": {"$exists": False}}]}),
+            self.crawler.stats)
+
+
+###############################################################################
+class CommentSpider(scrapy.Spider):
+    """Classe de coleta dos comentários de respostas e perguntas."""
+
+    name = 'quora_comment_spider'
+
+    custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
+        'DOWNLOAD_DELAY': 0.05,
+        'CONCURRENT_REQUESTS': 10,
+    }
+
+    # tipos de entidade comentada: (coleção, chave do template, variável)
+    comment_sources = {"answer": ("answers", "answer-comments-page", "aid"),
+                       "question": ("questions", "question-comments-page",
+                                    "qid")}
+
+    # ordenações da fila de entidades
+    orders = {"most_comments": [("numDisplayComments", -1)],
+              "natural": None}
+
+    # documentos trazidos do MongoDB por vez
+    queue_batch_size = 1000
+
+    def __init__(self, requests_params: dict, client: MongoClient,
+                 storage_options: dict = None, threshold: int = 0,
+                 order="most_comments", budget: CrawlBudget = None,
+                 database: str = "quora_database", prefix: str = ""):
+        """
+        Inicializa a instância de coleta de comentários.
+
+        São visitadas somente as answers e questions com numDisplayComments
+        maior que threshold, cada tipo com o seu template: as chaves
+        "answer-comments-page" e "question-comments-page" do arquivo de
+        parâmetros, cujo payload recebe aid ou qid e o cursor after. Tipos
+        sem template são ignorados.
+
+        Parameters
+        ----------
+        requests_params : dict
+            Parâmetros de coleta de dados.
+        client : MongoClient
+            Cliente do MongoDB.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage). The default
+            is None.
+        threshold : int, optional
+            Entidades com até threshold comentários são ignoradas. The
+            default is 0.
+        order : str, optional
+            Ordem de visita das entidades. The default is "most_comments".
+            Deve ser um dos valores:
+                "most_comments": as com mais comentários primeiro;
+                "natural": a ordem das coleções.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo. The default is None,
+            sem limite.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o order seja definido fora dos padrões.
+            Erro caso o requests_params seja definido fora dos padrões.
+
+        Returns
+        -------
+        None.
+
+        """
+        super().__init__()
+
+        if order not in self.orders:
+            raise ValueError("Especifique o order corretamente.")
+        self.threshold = threshold
+        self.order = order
+
+        self._db = Namespace(client, database, prefix)
+        self._storage = Storage(self._db, **(storage_options or {}))
+        self.budget = budget if budget is not None else CrawlBudget()
+
+        self.templates = dict()
+        try:
+            for kind, (_, key, _) in self.comment_sources.items():
+                if key not in requests_params:
+                    continue
+                params = requests_params[key]
+                headers = dict(params['headers'])
+                headers['user-agent'] = (headers.get('user-agent', '')
+                                         + str(requests_params['user-agent']))
+                self.templates[kind] = {'url': params['url'],
+                                        'headers': headers,
+                                        'payload': params['payload'],
+                                        'cookies': params['cookies']}
+        except Exception:
+            raise ValueError("Verifique o arquivo de parâmetros.")
+        if not self.templates:
+            raise ValueError("Verifique o arquivo de parâmetros.")
+
+        self._db["comments"].create_index([("entity_type", 1),
+                                           ("entity_id", 1)])
+        if order == "most_comments":
+            for kind in self.templates:
+                self._db[self.comment_sources[kind][0]].create_index(
+                    self.orders[order])
+
+    def _entities(self, kind):
+        """Entidades de um tipo com mais de threshold comentários."""
+        collection = self.comment_sources[kind][0]
+        cursor = self._db[collection].find(
+            {"numDisplayComments": {"$gt": self.threshold}},
+            {"numDisplayComments": 1},
+            sort=self.orders[self.order],
+            batch_size=self.queue_batch_size,
+            no_cursor_timeout=True)
+        try:
+            for entity in cursor:
+                yield kind, entity
+        finally:
+            cursor.close()
+
+    def start_requests(self):
+        """
+        Início da requisição do Scrapy.
+
+        As entidades com mais de threshold comentários são lidas sob
+        demanda; em "most_comments", answers e questions são intercaladas
+        pela quantidade de comentários. A primeira página de cada thread
+        gera as seguintes pelo parse.
+        """
+        streams = [self._entities(kind) for kind in self.templates]
+        if self.order == "most_comments":
+            entities = heapq.merge(
+                *streams, key=lambda item: -item[1]["numDisplayComments"])
+        else:
+            entities = chain(*streams)
+
+        for kind, entity in tqdm(entities, desc="Lendo entidades:"):
+            if not self.budget.request("comment"):
+                return
+            yield self._request(kind, entity["_id"])
+
+    def _request(self, kind, eid, after=None, pages=0):
+        """Requisição de uma página de comentários da entidade eid."""
+        template = self.templates[kind]
+        field = self.comment_sources[kind][2]
+        variables = dict(template["payload"]["variables"], **{field: eid})
+        if after is not None:
+            variables["after"] = after
+        payload = dict(template["payload"], variables=variables)
+        return scrapy.http.JsonRequest(
+            url=template["url"],
+            headers=template["headers"],
+            data=payload,
+            cookies=template["cookies"],
+            callback=self.parse,
+            meta={'template': self.comment_sources[kind][1]},
+            errback=self.failed,
+            cb_kwargs={'kind': kind,
+                       'eid': eid,
+                       'pages': pages}
+        )
+
+    @staticmethod
+    def _connection(entity: dict):
+        """Conexão paginada (edges e pageInfo) de comentários da entidade."""
+        for value in entity.values():
+            if isinstance(value, dict) and "edges" in value and (
+                    "pageInfo" in value):
+                return value
+        return None
+
+    def parse(self, response, kind, eid, pages=0):
+        """
+        Tratamento de dados da requisição.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Resposta da requisição.
+        kind : str
+            Tipo da entidade comentada: "answer" ou "question".
+        eid : int
+            Identificação da entidade (aid ou qid).
+        pages : int, optional
+            Páginas da thread já analisadas nesta execução. The default is
+            0.
+
+        Yields
+        ------
+        scrapy.http.JsonRequest
+            Requisição da próxima página, se houver.
+
+        """
+        result = response.json()
+        self.budget.page()
+
+        connection = self._connection(result["data"].get(kind) or dict())
+        if connection is None:
+            return
+
+        comments = [item["node"] for item in connection["edges"]
+                    if item.get("node") is not None]
+        # inserindo comentários inéditos no banco - coleção comments
+        skipped = self._storage.add_comments(kind, eid, comments)
+        if skipped:
+            self.logger.warning(f"{skipped} comentários sem id ignorados "
+                                f"({kind} {eid}).")
+            self.crawler.stats.inc_value("comment/no_id", skipped)
+        self.crawler.stats.inc_value(f"comment/{kind}",
+                                     len(comments) - skipped)
+
+        pageInfo = connection["pageInfo"]
+        if pageInfo.get("hasNextPage", False) and (
+                self.budget.request("comment", pages + 1)):
+            yield self._request(kind, eid, pageInfo.get("endCursor"),
+                                pages + 1)
+
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
+
+        Os comentários já gravados da thread são mantidos; a thread é
+        coletada de novo na próxima execução.
+        """
+        kind = failure.request.cb_kwargs["kind"]
+        self.crawler.stats.inc_value(f"comment/failed_{kind}_pages")
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes ao final da coleta."""
+        self._storage.close(self.crawler.stats)
+
+
+class RelatedSpider(scrapy.Spider):
+    """Classe de expansão das questions pelas related questions."""
+
+    name = 'quora_related_spider'
+
+    # a fila de prioridades recebe -depth: busca em largura, e, em cada
+    # nível, as filas FIFO mantêm a ordem de descoberta
+    custom_settings = {
+        'DOWNLOADER_MIDDLEWARES': DOWNLOADER_MIDDLEWARES,
+        'EXTENSIONS': EXTENSIONS,
+        **HTTPCACHE_SETTINGS,
+        'DOWNLOAD_DELAY': 0.05,
+        'CONCURRENT_REQUESTS': 10,
+        'SCHEDULER_DISK_QUEUE': 'scrapy.squeues.PickleFifoDiskQueue',
+        'SCHEDULER_MEMORY_QUEUE': 'scrapy.squeues.FifoMemoryQueue',
+    }
+
+    def __init__(self, requests_params: dict, client: MongoClient,
+                 storage_options: dict = None, max_depth: int = 1,
+                 vocabulary=None, capacity: int = 10_000_000,
+                 error_rate: float = 0.001, budget: CrawlBudget = None,
+                 database: str = "quora_database", prefix: str = ""):
+        """
+        Inicializa a instância de expansão pelas related questions.
+
+        As questions já gravadas são as sementes (profundidade 0). As
+        related questions de cada question visitada são gravadas e, até
+        max_depth, visitadas em largura. O template é a chave "related-page"
+        do arquivo de parâmetros, cujo payload recebe o qid.
+
+        As questions já vistas ficam em um filtro de Bloom de memória fixa;
+        um falso positivo apenas deixa de expandir uma question inédita.
+
+        Parameters
+        ----------
+        requests_params : dict
+            Parâmetros de coleta de dados.
+        client : MongoClient
+            Cliente do MongoDB.
+        storage_options : dict, optional
+            Opções da camada de persistência (QStorage.Storage). The default
+            is None.
+        max_depth : int, optional
+            Profundidade máxima das questions gravadas, contada a partir das
+            sementes. The default is 1.
+        vocabulary : dict ou str, optional
+            Palavras-chave (ver QKeywords.vocabulary), por exemplo
+            "etc/keywords.json". Se definido, são gravadas e expandidas
+            somente as questions cujo título contém algum termo, associadas
+            às categories e queries dos termos encontrados. The default is
+            None, sem filtro.
+        capacity : int, optional
+            Quantidade esperada de questions vistas (ver
+            QFrontier.BloomFilter). The default is 10_000_000.
+        error_rate : float, optional
+            Taxa de falsos positivos do filtro. The default is 0.001.
+        budget : CrawlBudget, optional
+            Orçamento de requisições, páginas e tempo. The default is None,
+            sem limite.
+        database : str, optional
+            Banco de dados do MongoDB. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções da execução (ver QStorage.Namespace). The
+            default is "".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o max_depth seja definido fora dos padrões.
+            Erro caso o requests_params seja definido fora dos padrões.
+
+        Returns
+        -------
+        None.
+
+        """
+        super().__init__()
+
+        if max_depth < 1:
+            raise ValueError("Especifique o max_depth corretamente.")
+        self.max_depth = max_depth
+        self.terms = None if vocabulary is None else _vocabulary(vocabulary)
+
+        self._db = Namespace(client, database, prefix)
+        self._storage = Storage(self._db, **(storage_options or {}))
+        self.budget = budget if budget is not None else CrawlBudget()
+        self._seen = BloomFilter(capacity, error_rate)
+
+        try:
+            params = requests_params['related-page']
+            self.url = params['url']
+            self.headers = dict(params['headers'])
+            self.headers['user-agent'] = (self.headers.get('user-agent', '')
+                                          + str(requests_params['user-agent']))
+            self.payload = params['payload']
+            self.cookies = params['cookies']
+        except Exception:
+            raise ValueError("Verifique o arquivo de parâmetros.")
+
+    def start_requests(self):
+        """
+        Início da requisição do Scrapy.
+
+        Todas as questions gravadas entram no filtro antes da expansão, para
+        que nenhuma delas seja gravada de novo como related question.
+        """
+        seeds = self._db["questions"]
+        for question in tqdm(stream(seeds, projection={"_id": 1}),
+                             total=seeds.estimated_document_count(),
+                             desc="Lendo sementes:"):
+            self._seen.add(question["_id"])
+
+        for question in stream(seeds, projection={"_id": 1}):
+            if not self.budget.request("related"):
+                return
+            yield self._request(question["_id"], 0)
+
+    def _request(self, qid, depth):
+        """Requisição das related questions da question qid."""
+        payload = dict(self.payload)
+        payload["variables"] = dict(self.payload["variables"], qid=qid)
+        return scrapy.http.JsonRequest(
+            url=self.url,
+            headers=self.headers,
+            data=payload,
+            cookies=self.cookies,
+            callback=self.parse,
+            meta={'template': 'related-page'},
+            errback=self.failed,
+            priority=-depth,
+            cb_kwargs={'qid': qid,
+                       'depth': depth}
+        )
+
+    @classmethod
+    def _questions(cls, value, qid):
+        """Questions (dicts com qid e title) da resposta, exceto a qid."""
+        if isinstance(value, dict):
+            if "qid" in value and "title" in value and value["qid"] != qid:
+                yield value
+                return
+            value = value.values()
+        elif not isinstance(value, list):
+            return
+        for item in value:
+            yield from cls._questions(item, qid)
+
+    def parse(self, response, qid, depth):
+        """
+        Tratamento de dados da requisição.
+
+        Parameters
+        ----------
+        response : requests.Response
+            Resposta da requisição.
+        qid : int
+            Identificação da question visitada.
+        depth : int
+            Profundidade da question visitada.
+
+        Yields
+        ------
+        scrapy.http.JsonRequest
+            Requisições das related questions inéditas, se houver.
+
+        """
+        result = response.json()
+        self.budget.page()
+
+        related = []
+        for question in self._questions(result.get("data"), qid):
+            rid = question["qid"]
+            if rid in self._seen:
+                related.append(rid)
+                continue
+
+            pairs = None
+            if self.terms is not None:
+                pairs = matching_pairs(
+                    plain_text(question.get("title", "")), self.terms)
+                if not pairs:
+                    self.crawler.stats.inc_value("related/filtered")
+                    continue
+            self._seen.add(rid)
+            related.append(rid)
+
+            # inserindo a question inédita no banco e na fila tmp da coleta
+            # de respostas, com as categories e queries dos termos do título
+            question["_id"] = rid
+            question["related_depth"] = depth + 1
+            self.crawler.stats.inc_value(f"related/depth_{depth + 1}")
+            if pairs:
+                for category, query in pairs:
+                    self._storage.add_result(category, query, "question",
+                                             question)
+            else:
+                question.setdefault("crawled_at", datetime.utcnow())
+                self._storage.writer.insert("questions", question)
+            if not question.get("url", "").startswith("/unanswered/"):
+                tmp = {"_id": rid,
+                       "followerCount": question.get("followerCount"),
+                       "numDisplayComments": question.get(
+                           "numDisplayComments")}
+                if pairs:
+                    tmp.update(category=pairs[0][0], query=pairs[0][1])
+                self._storage.writer.insert("tmp", tmp)
+
+            if depth + 1 < self.max_depth and self.budget.request("related"):
+                yield self._request(rid, depth + 1)
+
+        # inserindo relações question-related inéditas no banco
+        self._storage.add_related(qid, related)
+
+    def failed(self, failure):
+        """
+        Tratamento das requisições descartadas (ver QControl).
+
+        A question já está no banco; as suas related questions ficam para
+        uma próxima expansão.
+        """
+        depth = failure.request.cb_kwargs["depth"]
+        self.crawler.stats.inc_value(f"related/failed_depth_{depth}")
+
+    def closed(self, reason):
+        """Envia ao banco as escritas pendentes ao final da coleta."""
+        self.crawler.stats.set_value("related/seen", len(self._seen))
+        self.crawler.stats.set_value("related/filter_bytes",
+                                     self._seen.nbytes)
+        self._storage.close(self.crawler.stats)
@@ -0,0 +1,1126 @@
+"""Created on Sun October 18 22:30:00 2026.
+
+Camada de persistência do QScraper.
+
+As spiders não escrevem diretamente no MongoDB: a classe Storage decide como
+gravar cada entidade e suas relações, e os documentos são acumulados
+em buffers por coleção e enviados em lote (bulk_write não ordenado).
+Opcionalmente os documentos são codificados em BSON uma única vez, inclusive
+em um pool de processos, e entregues ao driver como RawBSONDocument.
+
+Com content_dedup, o corpo (content) das answers é gravado uma única vez na
+coleção contents, endereçado pelo seu hash; iter_answers devolve as answers
+com o content já resolvido.
+"""
+
+import hashlib
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+
+import bson
+
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from pymongo.errors import DuplicateKeyError
+from pymongo.operations import DeleteOne
+from pymongo.operations import InsertOne
+from pymongo.operations import UpdateOne
+
+# Código de erro do MongoDB para chave duplicada
+DUPLICATE_KEY = 11000
+
+# Tipos de resultado da busca do Quora: (campo do nó, identificador,
+# coleção da entidade). A relação com category-query de cada tipo fica na
+# coleção f"category_query_{identificador}", em minúsculas.
+SEARCH_RESULT_TYPES = {"question": ("question", "qid", "questions"),
+                       "topic": ("topic", "tid", "topics"),
+                       "answer": ("answer", "aid", "answers"),
+                       "post": ("post", "pid", "posts"),
+                       "profile": ("user", "uid", "users"),
+                       "tribe": ("tribe", "tribeId", "tribes")}
+
+# Coleções de relação category-query-entidade: (identificador, coleção)
+CATEGORY_QUERY_RELATIONS = {f"category_query_{field.lower()}": (field,
+                                                                entities)
+                            for _, field, entities
+                            in SEARCH_RESULT_TYPES.values()}
+
+# Coleções de relação cujo _id depende do esquema de chaves
+RELATION_COLLECTIONS = tuple(CATEGORY_QUERY_RELATIONS) + ("question_answer",)
+
+
+def bulk_write(collection, requests) -> tuple:
+    """
+    Executa um bulk_write não ordenado, ignorando chaves duplicadas.
+
+    Parameters
+    ----------
+    collection : Collection
+        Coleção do MongoDB.
+    requests : list
+        Operações do pymongo (InsertOne, UpdateOne, ...).
+
+    Raises
+    ------
+    BulkWriteError
+        Erro caso alguma escrita falhe por motivo diferente de chave
+        duplicada.
+
+    Returns
+    -------
+    tuple
+        (recusadas, upserted): quantidade de operações recusadas por chave
+        duplicada e lista dos _id dos documentos inseridos pelos upserts.
+
+    """
+    try:
+        result = collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        return len(errors), [u["_id"] for u in e.details.get("upserted", [])]
+    return 0, list(result.upserted_ids.values())
+
+
+class BulkWriter:
+    """Buffer de escritas em lote no MongoDB."""
+
+    def __init__(self, db, batch_size=500, raw_bson=False,
+                 encoder_processes=0):
+        """
+        Acumula escritas por coleção e as envia em lotes não ordenados.
+
+        Parameters
+        ----------
+        db : Database
+            Banco de dados do MongoDB.
+        batch_size : int, optional
+            Quantidade de operações acumuladas por coleção antes do envio.
+            The default is 500.
+        raw_bson : bool, optional
+            Codifica os documentos inseridos em BSON uma única vez e os envia
+            como RawBSONDocument. The default is False.
+        encoder_processes : int, optional
+            Quantidade de processos usados na codificação BSON. Só tem efeito
+            com raw_bson=True; 0 codifica no próprio processo. The default
+            is 0.
+
+        Raises
+        ------
+        ValueError
+            Erro caso batch_size ou encoder_processes sejam inválidos.
+
+        Returns
+        -------
+        None.
+
+        """
+        if batch_size < 1:
+            raise ValueError("O batch_size deve ser maior que zero.")
+        if encoder_processes < 0:
+            raise ValueError("O encoder_processes não pode ser negativo.")
+
+        self._db = db
+        self.batch_size = batch_size
+        self.raw_bson = raw_bson
+        self.encoder_processes = encoder_processes
+        self._pool = None
+        if raw_bson and encoder_processes > 0:
+            self._pool = ProcessPoolExecutor(encoder_processes)
+
+        # operações pendentes por coleção, na forma (tipo, argumentos)
+        self._buffers = dict()
+        # contadores de escrita por coleção
+        self.stats = dict()
+
+    def insert(self, collection: str, document: dict):
+        """Insere um documento, ignorando chaves duplicadas."""
+        self._add(collection, ("insert", document))
+
+    def update(self, collection: str, filter: dict, update: dict,
+               upsert=False):
+        """Atualiza um documento."""
+        self._add(collection, ("update", (filter, update, upsert)))
+
+    def delete(self, collection: str, filter: dict):
+        """Remove um documento."""
+        self._add(collection, ("delete", filter))
+
+    def _add(self, collection, op):
+        buffer = self._buffers.setdefault(collection, [])
+        buffer.append(op)
+        if len(buffer) >= self.batch_size:
+            self.flush(collection)
+
+    def _encode(self, documents):
+        if self._pool is not None:
+            chunksize = max(1,
+                            len(documents) // (4 * self.encoder_processes))
+            encoded = self._pool.map(bson.encode, documents,
+                                     chunksize=chunksize)
+        else:
+            encoded = map(bson.encode, documents)
+        return [RawBSONDocument(data) for data in encoded]
+
+    def _requests(self, buffer):
+        inserts = [args for kind, args in buffer if kind == "insert"]
+        if self.raw_bson and inserts:
+            inserts = self._encode(inserts)
+
+        requests = []
+        inserts = iter(inserts)
+        for kind, args in buffer:
+            if kind == "insert":
+                requests.append(InsertOne(next(inserts)))
+            elif kind == "update":
+                filter, update, upsert = args
+                requests.append(UpdateOne(filter, update, upsert=upsert))
+            else:
+                requests.append(DeleteOne(args))
+        return requests
+
+    def flush(self, collection=None):
+        """
+        Envia as operações pendentes.
+
+        Parameters
+        ----------
+        collection : str, optional
+            Coleção a ser enviada. The default is None, que envia todas.
+
+        Raises
+        ------
+        BulkWriteError
+            Erro caso alguma escrita falhe por motivo diferente de chave
+            duplicada.
+
+        Returns
+        -------
+        None.
+
+        """
+        names = [collection] if collection is not None else list(
+            self._buffers)
+        for name in names:
+            buffer = self._buffers.pop(name, None)
+            if not buffer:
+                continue
+
+            stats = self.stats.setdefault(name, {"written": 0,
+                                                 "duplicates": 0})
+            duplicates, _ = bulk_write(self._db[name],
+                                       self._requests(buffer))
+            stats["duplicates"] += duplicates
+            stats["written"] += len(buffer) - duplicates
+
+    def close(self):
+        """Envia as operações pendentes e encerra o pool de codificação."""
+        try:
+            self.flush()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+class RelationKeys:
+    """Esquema de chaves (_id) das coleções de relação."""
+
+    schemes = ("string", "compound", "int64")
+
+    def __init__(self, db, scheme="string"):
+        """
+        Monta os documentos de relação no esquema de chaves escolhido.
+
+        Nos esquemas inteiros, category e query recebem um identificador
+        inteiro (campo iid das coleções category e query), atribuído por um
+        contador na coleção counters e mantido em cache.
+
+        Parameters
+        ----------
+        db : Database
+            Banco de dados do MongoDB.
+        scheme : str, optional
+            Esquema de chaves. The default is "string".
+            Deve ser um dos valores:
+                "string": f"{category}_{query}_{qid}" e f"{qid}_{aid}";
+                "compound": subdocumentos {"c", "q", "qid"} e
+                    {"qid", "aid"} com category e query inteiros;
+                "int64": inteiros empacotados: 7 bits de category, 24 bits
+                    de query e 32 bits de qid/tid; 31 bits de qid e 32 bits
+                    de aid. Relações cujos ids não cabem nesses bits recebem
+                    a chave do esquema "compound", com os mesmos campos.
+
+        Raises
+        ------
+        ValueError
+            Erro caso o scheme seja definido fora dos padrões.
+
+        Returns
+        -------
+        None.
+
+        """
+        if scheme not in self.schemes:
+            raise ValueError("Especifique o relation_keys corretamente.")
+
+        self._db = db
+        self.scheme = scheme
+        self._iids = {"category": dict(), "query": dict()}
+        self._names = {"category": dict(), "query": dict()}
+        # relações do esquema int64 gravadas com a chave compound
+        self.fallbacks = 0
+
+    def intern(self, kind: str, name: str) -> int:
+        """Retorna o inteiro associado a uma category ou query."""
+        cache = self._iids[kind]
+        if name not in cache:
+            doc = self._db[kind].find_one({"_id": name}, {"iid": 1})
+            if doc is None or "iid" not in doc:
+                iid = self._db["counters"].find_one_and_update(
+                    {"_id": kind}, {"$inc": {"seq": 1}}, upsert=True,
+                    return_document=ReturnDocument.AFTER)["seq"]
+                try:
+                    self._db[kind].update_one(
+                        {"_id": name, "iid": {"$exists": False}},
+                        {"$set": {"iid": iid}}, upsert=True)
+                except DuplicateKeyError:
+                    # outro processo atribuiu o iid primeiro
+                    pass
+                doc = self._db[kind].find_one({"_id": name}, {"iid": 1})
+            cache[name] = doc["iid"]
+            self._names[kind][doc["iid"]] = name
+        return cache[name]
+
+    def name(self, kind: str, iid: int) -> str:
+        """Retorna a category ou query associada a um inteiro."""
+        cache = self._names[kind]
+        if iid not in cache:
+            doc = self._db[kind].find_one({"iid": iid}, {"_id": 1})
+            if doc is None:
+                raise KeyError(f"{kind} {iid} inexistente.")
+            cache[iid] = doc["_id"]
+            self._iids[kind][doc["_id"]] = iid
+        return cache[iid]
+
+    def _ids(self, category, query):
+        return self.intern("category", category), self.intern("query",
+                                                               query)
+
+    @staticmethod
+    def _fits(c=0, q=0, eid=0, eid_bits=32) -> bool:
+        """Indica se os ids cabem nos bits da chave int64."""
+        return (0 <= c < 2 ** 7 and 0 <= q < 2 ** 24
+                and isinstance(eid, int) and 0 <= eid < 2 ** eid_bits)
+
+    def category_query(self, category: str, query: str):
+        """Chave do par category-query."""
+        if self.scheme == "string":
+            return f"{category}_{query}"
+        c, q = self._ids(category, query)
+        if self.scheme == "int64" and self._fits(c, q):
+            return c << 24 | q
+        if self.scheme == "int64":
+            self.fallbacks += 1
+        return {"c": c, "q": q}
+
+    def category_query_entity(self, category: str, query: str, field: str,
+                              eid: int) -> dict:
+        """Documento de relação category-query-entidade (qid ou tid)."""
+        if self.scheme == "string":
+            return {"_id": f"{category}_{query}_{eid}",
+                    "category_query": f"{category}_{query}",
+                    field: eid}
+        c, q = self._ids(category, query)
+        if self.scheme == "int64" and self._fits(c, q, eid):
+            key = c << 56 | q << 32 | eid
+        else:
+            if self.scheme == "int64":
+                self.fallbacks += 1
+            key = {"c": c, "q": q, field: eid}
+        return {"_id": key, "category": c, "query": q, field: eid}
+
+    def category_query_filter(self, category: str, query: str) -> dict:
+        """Filtro das relações category-query-entidade de um par."""
+        if self.scheme == "string":
+            return {"category_query": f"{category}_{query}"}
+        c, q = self._ids(category, query)
+        return {"category": c, "query": q}
+
+    def question_answer(self, qid: int, aid: int) -> dict:
+        """Documento de relação question-answer."""
+        if self.scheme == "string":
+            key = f"{qid}_{aid}"
+        elif self.scheme == "int64" and self._fits(eid=qid, eid_bits=31) and (
+                self._fits(eid=aid)):
+            key = qid << 32 | aid
+        else:
+            if self.scheme == "int64":
+                self.fallbacks += 1
+            key = {"qid": qid, "aid": aid}
+        return {"_id": key, "qid": qid, "aid": aid}
+
+    def unpack_category_query_entity(self, key, field: str) -> tuple:
+        """
+        Par category-query e entidade de uma chave de relação.
+
+        Parameters
+        ----------
+        key : str, dict ou int
+            _id da relação category-query-entidade, em qualquer esquema.
+        field : str
+            Identificador da entidade, por exemplo "qid" ou "tid".
+
+        Raises
+        ------
+        KeyError
+            Erro caso o par category-query não esteja no banco.
+
+        Returns
+        -------
+        tuple
+            (category, query, identificador da entidade).
+
+        """
+        if isinstance(key, str):
+            # o _id em string é ambíguo quando há "_": o par vem da coleção
+            # category_query
+            pair, eid = key.rsplit("_", 1)
+            doc = self._db["category_query"].find_one(
+                {"_id": pair}, {"category": 1, "query": 1})
+            if doc is None:
+                raise KeyError(f"category_query {pair} inexistente.")
+            return doc["category"], doc["query"], int(eid)
+        if isinstance(key, dict):
+            c, q, eid = key["c"], key["q"], key[field]
+        else:
+            c, q, eid = key >> 56, key >> 32 & 2 ** 24 - 1, key & 2 ** 32 - 1
+        return self.name("category", c), self.name("query", q), eid
+
+    @staticmethod
+    def unpack_question_answer(key) -> tuple:
+        """(qid, aid) de uma chave de relação question-answer."""
+        if isinstance(key, str):
+            qid, aid = key.split("_")
+            return int(qid), int(aid)
+        if isinstance(key, dict):
+            return key["qid"], key["aid"]
+        return key >> 32, key & 2 ** 32 - 1
+
+    def check(self):
+        """
+        Confere se o banco já usa o esquema de chaves escolhido.
+
+        O esquema é registrado na coleção metadata. Bancos sem registro e com
+        relações gravadas são considerados no esquema "string".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o banco use outro esquema; utilize o Migrate.py.
+
+        Returns
+        -------
+        None.
+
+        """
+        doc = self._db["metadata"].find_one({"_id": "relation_keys"})
+        if doc is not None:
+            current = doc["scheme"]
+        elif any(self._db[name].find_one({}, {"_id": 1}) is not None
+                 for name in RELATION_COLLECTIONS):
+            current = "string"
+        else:
+            current = self.scheme
+            self._db["metadata"].update_one(
+                {"_id": "relation_keys"}, {"$set": {"scheme": current}},
+                upsert=True)
+
+        if current != self.scheme:
+            raise ValueError(f"O banco usa relation_keys={current!r}; "
+                             "converta-o com o Migrate.py.")
+
+
+class Storage:
+    """Gravação das entidades coletadas e de suas relações."""
+
+    relation_layouts = ("collections", "embedded")
+
+    # coleções de relação category-query-entidade: (campo, coleção)
+    category_query_relations = CATEGORY_QUERY_RELATIONS
+
+    def __init__(self, db, relation_layout="collections",
+                 relation_keys="string", content_dedup=False,
+                 **writer_options):
+        """
+        Camada de persistência utilizada pelas spiders.
+
+        Parameters
+        ----------
+        db : Database
+            Banco de dados do MongoDB.
+        relation_layout : str, optional
+            Forma de armazenar as relações. The default is "collections".
+            Deve ser um dos valores:
+                "collections": coleções de junção category_query_qid,
+                    category_query_tid, ... (uma por tipo de resultado da
+                    busca) e question_answer;
+                "embedded": arrays no próprio documento, atualizados com
+                    $addToSet em lote: category_query nas entidades
+                    encontradas pela busca e aids em questions.
+        relation_keys : str, optional
+            Esquema de chaves das relações (ver RelationKeys). The default is
+            "string".
+        content_dedup : bool, optional
+            Grava o content das answers na coleção contents, uma vez por
+            corpo distinto, e guarda na answer apenas o content_hash. The
+            default is False.
+        **writer_options
+            Opções repassadas ao BulkWriter.
+
+        Raises
+        ------
+        ValueError
+            Erro caso o relation_layout ou o relation_keys sejam definidos
+            fora dos padrões.
+            Erro caso o banco use outro esquema de chaves.
+
+        Returns
+        -------
+        None.
+
+        """
+        if relation_layout not in self.relation_layouts:
+            raise ValueError("Especifique o relation_layout corretamente.")
+
+        self._db = db
+        self.relation_layout = relation_layout
+        self.keys = RelationKeys(db, relation_keys)
+        self.keys.check()
+        self.content_dedup = content_dedup
+        self.writer = BulkWriter(db, **writer_options)
+
+        if relation_layout == "embedded":
+            # índices multikey usados na travessia category -> entidade
+            for _, entities in self.category_query_relations.values():
+                db[entities].create_index("category_query")
+
+    def copy_category_query(self, source: str, target: str, query: str):
+        """
+        Replica para a category target as relações de source com a query.
+
+        Utilizado quando a mesma query aparece em outra category depois de
+        já ter sido buscada: os resultados são reaproveitados em vez de
+        buscados novamente.
+
+        Parameters
+        ----------
+        source : str
+            Category cujas relações com a query já estão gravadas.
+        target : str
+            Category que passa a ter as mesmas relações.
+        query : str
+            Query compartilhada pelas duas categories.
+
+        Returns
+        -------
+        None.
+
+        """
+        for name, (field, entities) in self.category_query_relations.items():
+            if self.relation_layout == "embedded":
+                self.writer.flush(entities)
+                self._db[entities].update_many(
+                    {"category_query": self.keys.category_query(source,
+                                                                query)},
+                    {"$addToSet": {"category_query":
+                                   self.keys.category_query(target, query)}})
+                continue
+
+            self.writer.flush(name)
+            for relation in stream(
+                    self._db[name],
+                    self.keys.category_query_filter(source, query),
+                    {field: 1}):
+                self.writer.insert(name, self.keys.category_query_entity(
+                    target, query, field, relation[field]))
+
+    def add_category_queries(self, pairs):
+        """
+        Insere as category, query e category_query inéditas.
+
+        São feitos três upserts em lote não ordenados, um por coleção,
+        independentemente da quantidade de pares.
+
+        Parameters
+        ----------
+        pairs : iterable
+            Pares (category, query).
+
+        Returns
+        -------
+        set
+            Pares (category, query) que ainda não existiam no banco.
+
+        """
+        categories, queries, relations = dict(), dict(), dict()
+        for category, query in pairs:
+            categories[category] = UpdateOne(
+                {"_id": category}, {"$setOnInsert": {"_id": category}},
+                upsert=True)
+            queries[query] = UpdateOne(
+                {"_id": query}, {"$setOnInsert": {"_id": query}},
+                upsert=True)
+            relations[category, query] = UpdateOne(
+                {"_id": f"{category}_{query}"},
+                {"$setOnInsert": {"query": query, "category": category}},
+                upsert=True)
+
+        for name, requests in (("category", categories),
+                               ("query", queries)):
+            if requests:
+                bulk_write(self._db[name], list(requests.values()))
+        if not relations:
+            return set()
+
+        _, inserted = bulk_write(self._db["category_query"],
+                                 list(relations.values()))
+        inserted = set(inserted)
+        return {pair for pair in relations
+                if f"{pair[0]}_{pair[1]}" in inserted}
+
+    def fresh_queries(self, queries, ttl: float) -> dict:
+        """
+        Queries buscadas por completo há menos de ttl segundos.
+
+        Parameters
+        ----------
+        queries : iterable
+            Queries consultadas.
+        ttl : float
+            Validade, em segundos, de uma busca completa.
+
+        Returns
+        -------
+        dict
+            Para cada query ainda válida, a category cujas relações foram
+            gravadas na última busca completa.
+
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+        return {doc["_id"]: doc.get("crawled_category")
+                for doc in self._db["query"].find(
+                    {"_id": {"$in": list(queries)},
+                     "last_crawled": {"$gte": cutoff}},
+                    {"crawled_category": 1})}
+
+    def mark_crawled(self, query: str, category: str):
+        """Registra a busca completa da query, gravada para a category."""
+        self.writer.update("query", {"_id": query},
+                           {"$set": {"last_crawled": datetime.utcnow(),
+                                     "crawled_category": category},
+                            "$unset": {"cursor": "", "cursor_categories": ""}})
+
+    def mark_searched(self, query: str, category: str):
+        """Registra o fim da busca da query, gravada para a category."""
+        self.writer.update("query", {"_id": query},
+                           {"$set": {"searched_at": datetime.utcnow(),
+                                     "searched_category": category}})
+
+    def searched_queries(self, queries, since: datetime) -> dict:
+        """
+        Queries cuja busca terminou desde since.
+
+        Parameters
+        ----------
+        queries : iterable
+            Queries consultadas.
+        since : datetime
+            Início do período, por exemplo o início da execução.
+
+        Returns
+        -------
+        dict
+            Para cada query, a category cujas relações foram gravadas.
+
+        """
+        self.writer.flush("query")
+        return {doc["_id"]: doc["searched_category"]
+                for doc in self._db["query"].find(
+                    {"_id": {"$in": list(queries)},
+                     "searched_at": {"$gte": since}},
+                    {"searched_category": 1})}
+
+    def save_cursor(self, query: str, categories: list, after: int,
+                    time: str = "all_times"):
+        """Grava o cursor de uma busca interrompida da query."""
+        self.writer.update("query", {"_id": query},
+                           {"$set": {f"cursor.{time}": after,
+                                     "cursor_categories": list(categories)}})
+
+    def clear_cursor(self, query: str, time: str = "all_times"):
+        """Remove o cursor de uma partição da query."""
+        self.writer.update("query", {"_id": query},
+                           {"$unset": {f"cursor.{time}": ""}})
+
+    def cursors(self):
+        """Buscas interrompidas: (query, categories, time, after)."""
+        for doc in stream(self._db["query"], {"cursor": {"$exists": True}},
+                          {"cursor": 1, "cursor_categories": 1}):
+            for time, after in doc["cursor"].items():
+                yield doc["_id"], doc["cursor_categories"], time, after
+
+    def keyword_position(self) -> int:
+        """Pares category-query já lidos da fonte de palavras-chave."""
+        doc = self._db["metadata"].find_one({"_id": "keyword_position"})
+        return doc["position"] if doc is not None else 0
+
+    def save_keyword_position(self, position: int):
+        """Grava os pares lidos da fonte; 0 indica a leitura completa."""
+        self._db["metadata"].update_one({"_id": "keyword_position"},
+                                        {"$set": {"position": position}},
+                                        upsert=True)
+
+    def known_ids(self, category: str, query: str, field: str,
+                  ids: list) -> set:
+        """
+        Entidades já relacionadas ao par category-query.
+
+        Parameters
+        ----------
+        category : str
+            Category do par.
+        query : str
+            Query do par.
+        field : str
+            Identificador da entidade, por exemplo "qid" ou "tid" (ver
+            SEARCH_RESULT_TYPES).
+        ids : list
+            Identificadores consultados.
+
+        Returns
+        -------
+        set
+            Identificadores de ids que já têm a relação gravada.
+
+        """
+        name = f"category_query_{field.lower()}"
+        entities = self.category_query_relations[name][1]
+        if self.relation_layout == "embedded":
+            cursor = self._db[entities].find(
+                {"_id": {"$in": ids},
+                 "category_query": self.keys.category_query(category, query)},
+                {"_id": 1})
+            return {doc["_id"] for doc in cursor}
+
+        cursor = self._db[name].find(
+            dict(self.keys.category_query_filter(category, query),
+                 **{field: {"$in": ids}}),
+            {field: 1})
+        return {doc[field] for doc in cursor}
+
+    def _add_embedded(self, collection, document, category_query):
+        body = {k: v for k, v in document.items() if k != "_id"}
+        self.writer.update(collection, {"_id": document["_id"]},
+                           {"$setOnInsert": body,
+                            "$addToSet": {"category_query": category_query}},
+                           upsert=True)
+
+    def add_result(self, category: str, query: str, result_type: str,
+                   entity: dict):
+        """
+        Grava uma entidade encontrada na busca de category/query.
+
+        Parameters
+        ----------
+        category : str
+            Category da busca.
+        query : str
+            Query da busca.
+        result_type : str
+            searchResultType da entidade (ver SEARCH_RESULT_TYPES).
+        entity : dict
+            Entidade, com o _id já atribuído.
+
+        Returns
+        -------
+        None.
+
+        """
+        _, field, entities = SEARCH_RESULT_TYPES[result_type]
+        # instante da coleta, usado nas coletas incrementais (ProfileSpider)
+        entity.setdefault("crawled_at", datetime.utcnow())
+        if result_type == "answer":
+            self._dedup_content(entity)
+        if self.relation_layout == "embedded":
+            self._add_embedded(entities, entity,
+                               self.keys.category_query(category, query))
+            return
+
+        # inserindo relações category-query-entidade inéditas no banco -
+        # coleção category_query_<identificador>
+        self.writer.insert(f"category_query_{field.lower()}",
+                           self.keys.category_query_entity(
+                               category, query, field, entity["_id"]))
+        # inserindo entidades inéditas no banco
+        self.writer.insert(entities, entity)
+
+    def add_question(self, category: str, query: str, question: dict):
+        """Grava uma question encontrada na busca de category/query."""
+        self.add_result(category, query, "question", question)
+
+    def add_topic(self, category: str, query: str, topic: dict):
+        """Grava um topic encontrado na busca de category/query."""
+        self.add_result(category, query, "topic", topic)
+
+    def _dedup_content(self, answer):
+        if self.content_dedup and "content" in answer:
+            content = answer.pop("content")
+            answer["content_hash"] = content_hash(content)
+            self.writer.insert("contents",
+                               {"_id": answer["content_hash"],
+                                "content": content})
+
+    def add_answers(self, qid: int, answers: list):
+        """Grava uma página de answers da question qid."""
+        now = datetime.utcnow()
+        for answer in answers:
+            answer.setdefault("crawled_at", now)
+            self._dedup_content(answer)
+            if self.relation_layout == "collections":
+                # Inserindo relações question-answer inéditas no banco -
+                # coleção question_answer
+                self.writer.insert("question_answer",
+                                   self.keys.question_answer(qid,
+                                                             answer["_id"]))
+            # inserindo answers inéditas no banco - coleção answers
+            self.writer.insert("answers", answer)
+
+        if self.relation_layout == "embedded" and answers:
+            aids = [answer["_id"] for answer in answers]
+            self.writer.update("questions", {"_id": qid},
+                               {"$addToSet": {"aids": {"$each": aids}}})
+
+    def add_related(self, qid: int, rids: list):
+        """Grava as relações da question qid com as related questions rids."""
+        if self.relation_layout == "embedded":
+            if rids:
+                self.writer.update("questions", {"_id": qid},
+                                   {"$addToSet": {"related": {"$each": rids}}})
+            return
+        # inserindo relações question-related inéditas no banco - coleção
+        # question_related
+        for rid in rids:
+            self.writer.insert("question_related",
+                               {"_id": f"{qid}_{rid}", "qid": qid,
+                                "rid": rid})
+
+    def add_user(self, user: dict):
+        """Grava (ou atualiza) o perfil completo de um usuário."""
+        body = {k: v for k, v in user.items() if k != "_id"}
+        body["fetched_at"] = datetime.utcnow()
+        self.writer.update("users", {"_id": user["_id"]}, {"$set": body},
+                           upsert=True)
+
+    def add_comments(self, kind: str, eid: int, comments: list) -> int:
+        """
+        Grava uma página de comentários da entidade eid.
+
+        Os comentários são gravados na coleção comments, identificados pelo
+        seu id e pela entidade comentada (entity_type e entity_id).
+        Comentários sem id nem cid não são gravados.
+
+        Returns
+        -------
+        int
+            Quantidade de comentários ignorados por falta de id.
+
+        """
+        skipped = 0
+        for comment in comments:
+            cid = comment.get("id", comment.get("cid"))
+            if cid is None:
+                skipped += 1
+                continue
+            comment["_id"] = cid
+            comment["entity_type"] = kind
+            comment["entity_id"] = eid
+            self.writer.insert("comments", comment)
+        return skipped
+
+    def add_feed_stories(self, tid: int, stories: list):
+        """
+        Grava uma página de histórias do feed do tópico tid.
+
+        Cada história é gravada uma única vez na coleção feed_stories, pelo
+        seu id, e acumula em tids os tópicos em cujo feed apareceu.
+        """
+        for story in stories:
+            body = {k: v for k, v in story.items() if k != "id"}
+            self.writer.update("feed_stories", {"_id": story["id"]},
+                               {"$setOnInsert": body,
+                                "$addToSet": {"tids": tid}},
+                               upsert=True)
+
+    def save_feed_cursor(self, tid: int, cursor: dict):
+        """Grava o cursor do feed do tópico; None indica o fim do feed."""
+        if cursor is None:
+            update = {"$unset": {"feed_cursor": ""}}
+        else:
+            update = {"$set": {"feed_cursor": cursor}}
+        self.writer.update("topics", {"_id": tid}, update)
+
+    def stats(self) -> dict:
+        """Contadores de escrita da execução, por coleção."""
+        stats = dict()
+        for name, counts in self.writer.stats.items():
+            for key, value in counts.items():
+                stats[f"{name}/{key}"] = value
+
+        if self.keys.fallbacks:
+            stats["relation_keys/fallbacks"] = self.keys.fallbacks
+
+        contents = self.writer.stats.get("contents")
+        if contents and contents["written"]:
+            stats["contents/dedup_ratio"] = round(
+                (contents["written"] + contents["duplicates"])
+                / contents["written"], 3)
+        return stats
+
+    def close(self, stats=None):
+        """
+        Envia ao banco as escritas pendentes.
+
+        Parameters
+        ----------
+        stats : StatsCollector, optional
+            Coletor de estatísticas do Scrapy, que recebe os contadores de
+            escrita com o prefixo "storage/". The default is None.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.writer.close()
+        if stats is not None:
+            for key, value in self.stats().items():
+                stats.set_value(f"storage/{key}", value)
+
+
+class Namespace:
+    """Banco de dados de uma execução, com prefixo nos nomes das coleções."""
+
+    def __init__(self, client, database: str = "quora_database",
+                 prefix: str = ""):
+        """
+        Espaço de nomes das coleções de uma execução.
+
+        Funciona como o Database do pymongo nos acessos db[nome], que
+        devolvem a coleção f"{prefix}{nome}" do banco database. Execuções
+        com bancos ou prefixos diferentes não compartilham coleções,
+        inclusive as filas tmp e post_queue e a coleção control.
+
+        O prefixo termina em ".", que não aparece nos nomes das coleções do
+        QScraper: o espaço de nomes sem prefixo tem somente as coleções sem
+        ".", e "run1." não alcança as coleções de "run10.".
+
+        Parameters
+        ----------
+        client : MongoClient
+            Cliente do MongoDB.
+        database : str, optional
+            Nome do banco. The default is "quora_database".
+        prefix : str, optional
+            Prefixo das coleções, terminado em ".", por exemplo "run1.". The
+            default is "".
+
+        Raises
+        ------
+        ValueError
+            Erro caso o database ou o prefix sejam inválidos.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not database or any(c in database for c in '/\\. "$'):
+            raise ValueError("Especifique o database corretamente.")
+        if not self.valid_prefix(prefix):
+            raise ValueError("Especifique o prefix corretamente.")
+        self.client = client
+        self.database = client[database]
+        self.prefix = prefix
+        self.name = database
+
+    @staticmethod
+    def valid_prefix(prefix: str) -> bool:
+        """Prefixo vazio ou terminado em ".", sem "$" e fora de system."""
+        return "$" not in prefix and not prefix.startswith("system.") and (
+            not prefix or prefix.endswith("."))
+
+    def __getitem__(self, name: str):
+        return self.database[self.prefix + name]
+
+    def _owns(self, name: str) -> bool:
+        """Indica se a coleção name pertence ao espaço de nomes."""
+        return name.startswith(self.prefix) and (
+            "." not in name[len(self.prefix):])
+
+    def list_collection_names(self) -> list:
+        """Coleções do espaço de nomes, sem o prefixo."""
+        return [name[len(self.prefix):]
+                for name in self.database.list_collection_names()
+                if self._owns(name)]
+
+    def command(self, *args, **kwargs):
+        return self.database.command(*args, **kwargs)
+
+    def rename(self, prefix: str):
+        """
+        Arquiva as coleções com outro prefixo no mesmo banco.
+
+        O renameCollection dentro de um banco só altera metadados, sem
+        copiar documentos. As coleções dos demais prefixos não são movidas.
+        """
+        if not self.valid_prefix(prefix):
+            raise ValueError("Especifique o prefix corretamente.")
+        if prefix == self.prefix:
+            return
+        for name in self.list_collection_names():
+            self[name].rename(prefix + name, dropTarget=True)
+        self.prefix = prefix
+
+    def drop(self):
+        """
+        Apaga as coleções do espaço de nomes.
+
+        Sem prefixo, em um banco sem outros prefixos, o banco inteiro é
+        apagado com um único dropDatabase; as coleções dos demais prefixos
+        nunca são apagadas.
+        """
+        names = [name for name in self.database.list_collection_names()
+                 if not name.startswith("system.")]
+        if not self.prefix and all(self._owns(name) for name in names):
+            self.client.drop_database(self.name)
+            return
+        for name in self.list_collection_names():
+            self[name].drop()
+
+
+def stream(collection, filter=None, projection=None, batch_size=1000):
+    """
+    Itera uma coleção por um cursor do servidor, sem materializá-la.
+
+    O cursor não expira por inatividade, já que o consumo acompanha o ritmo
+    das requisições do Scrapy, e é fechado ao final ou quando o gerador é
+    descartado.
+
+    Parameters
+    ----------
+    collection : Collection
+        Coleção do MongoDB.
+    filter : dict, optional
+        Filtro da consulta. The default is None.
+    projection : dict, optional
+        Projeção da consulta. The default is None.
+    batch_size : int, optional
+        Documentos trazidos do servidor por getMore. The default is 1000.
+
+    Yields
+    ------
+    dict
+        Documentos da coleção.
+
+    """
+    cursor = collection.find(filter, projection, batch_size=batch_size,
+                             no_cursor_timeout=True)
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+
+def content_hash(content: str) -> str:
+    """Hash usado como _id da coleção contents."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def content_stats(db) -> dict:
+    """
+    Estatísticas de deduplicação do content das answers no banco.
+
+    Parameters
+    ----------
+    db : Database
+        Banco de dados do MongoDB.
+
+    Returns
+    -------
+    dict
+        Answers que referenciam a coleção contents, corpos distintos e a
+        razão entre os dois (dedup_ratio).
+
+    """
+    answers = db["answers"].count_documents(
+        {"content_hash": {"$exists": True}})
+    contents = db["contents"].estimated_document_count()
+    return {"answers": answers,
+            "contents": contents,
+            "dedup_ratio": answers / contents if contents else None}
+
+
+def iter_answers(db, filter=None, projection=None, batch_size=100):
+    """
+    Itera as answers do banco com o content resolvido.
+
+    Os corpos das answers gravadas com content_dedup são buscados na coleção
+    contents em lote, uma consulta por batch_size answers. Answers gravadas
+    sem deduplicação são devolvidas como estão.
+
+    Parameters
+    ----------
+    db : Database
+        Banco de dados do MongoDB.
+    filter : dict, optional
+        Filtro da consulta em answers. The default is None.
+    projection : dict, optional
+        Projeção da consulta em answers; o content_hash é incluído quando
+        necessário. The default is None.
+    batch_size : int, optional
+        Answers resolvidas por consulta à coleção contents. The default
+        is 100.
+
+    Yields
+    ------
+    dict
+        Answer com o campo content.
+
+    """
+    if isinstance(projection, dict) and any(projection.values()):
+        projection = dict(projection, content_hash=1)
+    cursor = db["answers"].find(filter, projection, batch_size=batch_size)
+
+    batch = []
+    for answer in cursor:
+        batch.append(answer)
+        if len(batch) >= batch_size:
+            yield from _resolve_contents(db, batch)
+            batch = []
+    yield from _resolve_contents(db, batch)
+
+
+def _resolve_contents(db, answers):
+    hashes = {a["content_hash"] for a in answers if "content_hash" in a}
+    if hashes:
+        bodies = {c["_id"]: c["content"]
+                  for c in db["contents"].find({"_id": {"$in": list(hashes)}})}
+        for answer in answers:
+            if "content_hash" in answer:
+                answer["content"] = bodies.get(answer["content_hash"])
+    return answers
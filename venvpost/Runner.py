@@ -8,24 +8,39 @@ do projeto final de graduação:
 """
 
 import json
+import logging
 
 from os.path import abspath as _abspath
 from os.path import isfile as _isfile
 from pymongo import MongoClient as _MongoClient
+from QArchive import reprocess as _reprocess
+from QBudget import CrawlBudget as _CrawlBudget
+from QControl import send_command as _send_command
+from QKeywords import keyword_pairs as _keyword_pairs
+from QScheduler import RevisitPolicy as _RevisitPolicy
 from QScraper import AnswerSpider as _AnswerSpider
+from QScraper import CommentSpider as _CommentSpider
 from QScraper import SearchSpider as _SearchSpider
 from QScraper import TopicSpider as _TopicSpider
 from QScraper import PostSpider as _PostSpider
+from QScraper import ProfileSpider as _ProfileSpider
+from QScraper import RelatedSpider as _RelatedSpider
+from QStorage import Namespace as _Namespace
 from scrapy.crawler import CrawlerRunner as _CrawlerRunner
 from scrapy.settings import Settings as _Settings
 from twisted.internet import defer as _defer
 from twisted.internet import reactor as _reactor
 
+_logger = logging.getLogger(__name__)
+
 
 class QScrapeRunner:
     """Executor das classes SearchSpider e AnswerSpider."""
 
-    def __init__(self, user: str, email: str, requests_params_path: str):
+    def __init__(self, user: str, email: str, requests_params_path: str,
+                 database: str = "quora_database", prefix: str = "",
+                 archive_dir: str = None, http_cache: bool = False,
+                 cache_ttl: dict = None):
         #print(requests_params_path)
         """
         Executor das classes SearchSpider e AnswerSpider.
@@ -42,6 +57,25 @@ class QScrapeRunner:
         requests_params_path : str
             Caminho completo para a pasta onde está localizado o JSON com os
             parâmetros de requisição.
+        database : str, optional
+            Banco de dados do MongoDB das coletas. The default is
+            "quora_database".
+        prefix : str, optional
+            Prefixo das coleções das coletas, terminado em ".", por exemplo
+            "projeto1.". Coletas com bancos ou prefixos diferentes podem
+            rodar em paralelo no mesmo MongoDB (ver QStorage.Namespace). The
+            default is "".
+        archive_dir : str, optional
+            Pasta onde as respostas brutas do GraphQL são arquivadas, para
+            o reprocess (ver QArchive). The default is None, sem arquivo.
+        http_cache : bool, optional
+            Guarda as respostas em disco e as reutiliza nas execuções
+            seguintes, dentro da validade de cada operação (ver QCache). The
+            default is False.
+        cache_ttl : dict, optional
+            Validade, em segundos, das respostas de cada operação, no
+            formato {queryName: segundos}, sobre o QCache.OPERATION_TTL. The
+            default is None.
 
         Returns
         -------
@@ -49,6 +83,11 @@ class QScrapeRunner:
 
         """
         self._read_requests_params(user, email, requests_params_path)
+        # Namespace(client, database, prefix) de todas as coletas
+        self._namespace = {"database": database, "prefix": prefix}
+        self._archive_dir = archive_dir
+        self._http_cache = http_cache
+        self._cache_ttl = cache_ttl or {}
 
     def _read_requests_params(self, user: str, email: str,
                               requests_params_path: str):
@@ -57,10 +96,31 @@ class QScrapeRunner:
                 p = json.loads(f.read())
                 p["user-agent"] = {"user": user, "e-mail": email}
                 self._requests_params = p
+            self._requests_params_path = _abspath(requests_params_path)
         else:
             raise FileExistsError("Especifique o requests_params_path "
                                   "corretamente.")
 
+    def _settings(self) -> _Settings:
+        # as credenciais de sessão são relidas do arquivo de parâmetros
+        # durante a coleta (ver QControl.CredentialsMiddleware)
+        settings = {"CREDENTIALS_PATH": self._requests_params_path}
+        if self._archive_dir is not None:
+            settings["ARCHIVE_DIR"] = _abspath(self._archive_dir)
+        if self._http_cache:
+            settings["HTTPCACHE_ENABLED"] = True
+            settings["HTTPCACHE_OPERATION_TTL"] = self._cache_ttl
+        return _Settings(settings)
+
+    def namespace(self, client: _MongoClient) -> _Namespace:
+        """
+        Banco e coleções das coletas deste executor.
+
+        Uma execução terminada pode ser arquivada com rename(novo_prefixo)
+        ou apagada com drop() (ver QStorage.Namespace).
+        """
+        return _Namespace(client, **self._namespace)
+
     def _read_keywords(self, filepath: str) -> dict:
         with open(filepath) as f:
             d = json.loads(f.read().lower())
@@ -72,7 +132,9 @@ class QScrapeRunner:
         return d
 
     def run(self, client: _MongoClient, keywords_path: str,
-            search_result_type="question"):
+            search_result_type="question", storage_options: dict = None,
+            fresh_ttl: float = None, fresh_mode="skip", priority=None,
+            budget: dict = None, resume=False, time_partitions: list = None):
         r"""
         Executor da coleta de dados.
 
@@ -92,9 +154,11 @@ class QScrapeRunner:
         ----------
         client : MongoClient
             Cliente do MongoDB.
-        keywords_path : str
+        keywords_path : str ou Collection
             Caminho completo para a pasta onde está localizado o JSON com as
-            queries.
+            queries. Também são aceitos arquivos .jsonl ou .csv e coleções do
+            MongoDB com pares (category, query), lidos sob demanda durante a
+            coleta (ver QKeywords.keyword_pairs).
         search_result_type : str, optional
             Filtro de busca no Quora. Por default o runner buscará somente as
             perguntas e na sequência, as respostas das perguntas. The default
@@ -107,31 +171,348 @@ class QScrapeRunner:
                 "profile": somente perfis;
                 "topic": somente tópicos;
                 "tribe": somente comunidades.
+        storage_options : dict, optional
+            Opções da camada de persistência repassadas às spiders. The
+            default is None. As chaves aceitas são:
+                "relation_layout": "collections" (coleções de junção) ou
+                    "embedded" (arrays nos documentos de questions e topics)
+                    (default "collections");
+                "relation_keys": esquema de _id das relações: "string",
+                    "compound" ou "int64" (default "string"). Bancos
+                    existentes são convertidos com o Migrate.py;
+                "content_dedup": grava cada content distinto das answers
+                    uma única vez na coleção contents (default False);
+                "batch_size": operações acumuladas por coleção antes do
+                    envio em lote (default 500);
+                "raw_bson": codifica os documentos uma única vez e os insere
+                    como RawBSONDocument (default False);
+                "encoder_processes": processos usados na codificação BSON
+                    quando raw_bson=True (default 0).
+        fresh_ttl : float, optional
+            Validade, em segundos, da última busca completa de uma query;
+            queries ainda válidas não são buscadas de novo. The default is
+            None, que busca todas as queries.
+        fresh_mode : str, optional
+            "skip" para pular as queries válidas ou "first_page" para buscar
+            apenas a primeira página delas e continuar somente se houver
+            resultados inéditos. The default is "skip".
+        priority : callable, optional
+            Prioridade das perguntas na coleta de respostas (ver
+            AnswerSpider). The default is None, que usa
+            QScheduler.question_priority.
+        budget : dict, optional
+            Orçamento da execução, compartilhado pelas spiders. The default
+            is None, sem limite. As chaves aceitas são:
+                "max_requests": requisições da execução;
+                "max_pages": páginas analisadas na execução;
+                "deadline": tempo máximo da execução, em segundos;
+                "query_pages": páginas de busca por query;
+                "question_pages": páginas de respostas por pergunta;
+                "topic_pages": páginas do feed por tópico;
+                "comment_pages": páginas de comentários por entidade.
+            Esgotado o orçamento, as requisições em curso terminam, as
+            escritas pendentes são enviadas e os cursores das paginações
+            interrompidas são gravados (coleções query e tmp).
+        resume : bool, optional
+            Retoma as buscas e a fila de perguntas interrompidas pelo
+            orçamento na execução anterior. The default is False.
+        time_partitions : list, optional
+            Filtros de tempo em que cada query é dividida (ver
+            SearchSpider). The default is None, sem divisão.
+
+        Returns
+        -------
+        dict
+            Consumo do orçamento e quantidade de queries e perguntas que
+            ficaram por coletar (ver QBudget.CrawlBudget.report).
 
         """
-        queries = self._read_keywords(keywords_path)
+        crawl_budget = _CrawlBudget(**(budget or {}))
+        if isinstance(keywords_path, str) and keywords_path.endswith(".json"):
+            queries = self._read_keywords(keywords_path)
+        else:
+            queries = _keyword_pairs(keywords_path)
 
-        settings = _Settings()
+        settings = self._settings()
 
         runner = _CrawlerRunner(settings)
 
         @_defer.inlineCallbacks
         def crawl():
+            # "all_types" grava todos os tipos de resultado na busca e
+            # segue com a coleta das respostas das perguntas e, se houver o
+            # template "post-page", das postagens encontradas; "post" já
+            # pagina as postagens na própria busca; "answer", "profile" e
+            # "tribe" terminam na busca
             search_types={
-                "question": _AnswerSpider,
-                "topic":_TopicSpider,
-                "post" : _PostSpider
+                "all_types": [_AnswerSpider, _PostSpider],
+                "question": [_AnswerSpider],
+                "topic": [_TopicSpider],
             }
             yield runner.crawl(_SearchSpider, queries,
                                self._requests_params, client=client,
-                               result_type=search_result_type)
-            yield runner.crawl(search_types[search_result_type], self._requests_params,
-                               client=client)
+                               result_type=search_result_type,
+                               storage_options=storage_options,
+                               fresh_ttl=fresh_ttl, fresh_mode=fresh_mode,
+                               budget=crawl_budget, resume=resume,
+                               time_partitions=time_partitions,
+                               **self._namespace)
+            for spider in search_types.get(search_result_type, []):
+                if (spider is _PostSpider
+                        and "post-page" not in self._requests_params):
+                    continue
+                options = dict(storage_options=storage_options,
+                               budget=crawl_budget)
+                if spider is _AnswerSpider:
+                    options["priority"] = priority
+                yield runner.crawl(spider, self._requests_params,
+                                   client=client, **options,
+                                   **self._namespace)
             _reactor.stop()
 
         crawl()
         _reactor.run()
 
+        report = crawl_budget.report()
+        if report["reason"] is not None:
+            _logger.warning(f"Orçamento esgotado ({report['reason']}): "
+                            f"{report['unfinished']} por coletar.")
+        return report
+
+    def refresh(self, client: _MongoClient, budget: int, horizon=86400,
+                storage_options: dict = None, priority=None):
+        """
+        Revisita as respostas das perguntas que mais mudam.
+
+        As perguntas são escolhidas pela QScheduler.RevisitPolicy, a partir
+        do histórico de visitas das coletas anteriores, e coletadas pela
+        AnswerSpider. O budget limita as requisições da execução inteira,
+        inclusive as das perguntas que ficaram na fila tmp de execuções
+        anteriores.
+
+        Parameters
+        ----------
+        client : MongoClient
+            Cliente do MongoDB.
+        budget : int
+            Quantidade máxima de requisições (páginas de respostas).
+        horizon : float, optional
+            Intervalo, em segundos, até a próxima revisita. The default is
+            86400.
+        storage_options : dict, optional
+            Opções da camada de persistência, como no run. The default is
+            None.
+        priority : callable, optional
+            Prioridade das perguntas, como no run. The default is None.
+
+        Returns
+        -------
+        dict
+            Consumo do orçamento (ver QBudget.CrawlBudget.report).
+
+        """
+        crawl_budget = _CrawlBudget(max_requests=budget)
+        policy = _RevisitPolicy(self.namespace(client))
+        if not policy.enqueue(budget, horizon):
+            return crawl_budget.report()
+
+        runner = _CrawlerRunner(self._settings())
+        d = runner.crawl(_AnswerSpider, self._requests_params, client=client,
+                         storage_options=storage_options, priority=priority,
+                         budget=crawl_budget, **self._namespace)
+        d.addBoth(lambda _: _reactor.stop())
+        _reactor.run()
+        return crawl_budget.report()
+
+    def profiles(self, client: _MongoClient, ttl: float = 30 * 86400,
+                 storage_options: dict = None, budget: dict = None):
+        """
+        Coleta os perfis dos autores de respostas e perguntas.
+
+        O arquivo de parâmetros deve conter a chave "profile-page". A coleta
+        é incremental: cada execução visita apenas os autores gravados
+        desde a anterior e os perfis expirados (ver ProfileSpider).
+
+        Parameters
+        ----------
+        client : MongoClient
+            Cliente do MongoDB.
+        ttl : float, optional
+            Validade, em segundos, de um perfil coletado. The default is 30
+            dias.
+        storage_options : dict, optional
+            Opções da camada de persistência, como no run. The default is
+            None.
+        budget : dict, optional
+            Orçamento da execução, como no run. The default is None.
+
+        Returns
+        -------
+        dict
+            Consumo do orçamento (ver QBudget.CrawlBudget.report).
+
+        """
+        crawl_budget = _CrawlBudget(**(budget or {}))
+        runner = _CrawlerRunner(self._settings())
+        d = runner.crawl(_ProfileSpider, self._requests_params,
+                         client=client, storage_options=storage_options,
+                         ttl=ttl, budget=crawl_budget,
+                         **self._namespace)
+        d.addBoth(lambda _: _reactor.stop())
+        _reactor.run()
+        return crawl_budget.report()
+
+    def comments(self, client: _MongoClient, threshold: int = 0,
+                 order="most_comments", storage_options: dict = None,
+                 budget: dict = None):
+        """
+        Coleta os comentários das answers e questions já gravadas.
+
+        O arquivo de parâmetros deve conter as chaves
+        "answer-comments-page" e/ou "question-comments-page" (ver
+        CommentSpider).
+
+        Parameters
+        ----------
+        client : MongoClient
+            Cliente do MongoDB.
+        threshold : int, optional
+            Entidades com até threshold comentários são ignoradas. The
+            default is 0.
+        order : str, optional
+            "most_comments" ou "natural". The default is "most_comments".
+        storage_options : dict, optional
+            Opções da camada de persistência, como no run. The default is
+            None.
+        budget : dict, optional
+            Orçamento da execução, como no run. The default is None.
+
+        Returns
+        -------
+        dict
+            Consumo do orçamento (ver QBudget.CrawlBudget.report).
+
+        """
+        crawl_budget = _CrawlBudget(**(budget or {}))
+        runner = _CrawlerRunner(self._settings())
+        d = runner.crawl(_CommentSpider, self._requests_params,
+                         client=client, storage_options=storage_options,
+                         threshold=threshold, order=order,
+                         budget=crawl_budget,
+                         **self._namespace)
+        d.addBoth(lambda _: _reactor.stop())
+        _reactor.run()
+        return crawl_budget.report()
+
+    def related(self, client: _MongoClient, max_depth: int = 1,
+                keywords_path: str = None, storage_options: dict = None,
+                capacity: int = 10_000_000, budget: dict = None):
+        """
+        Expande as questions gravadas pelas related questions.
+
+        O arquivo de parâmetros deve conter a chave "related-page" (ver
+        RelatedSpider). As questions inéditas entram na fila tmp; as
+        respostas são coletadas por um run seguinte ou pelo refresh.
+
+        Parameters
+        ----------
+        client : MongoClient
+            Cliente do MongoDB.
+        max_depth : int, optional
+            Profundidade máxima da expansão. The default is 1.
+        keywords_path : str, optional
+            Arquivo de palavras-chave, por exemplo "etc/keywords.json", que
+            filtra as questions pelo título. The default is None, sem
+            filtro.
+        storage_options : dict, optional
+            Opções da camada de persistência, como no run. The default is
+            None.
+        capacity : int, optional
+            Quantidade esperada de questions vistas, que dimensiona o filtro
+            de Bloom. The default is 10_000_000.
+        budget : dict, optional
+            Orçamento da execução, como no run. The default is None.
+
+        Returns
+        -------
+        dict
+            Consumo do orçamento (ver QBudget.CrawlBudget.report).
+
+        """
+        if keywords_path is not None:
+            keywords_path = _abspath(keywords_path)
+        crawl_budget = _CrawlBudget(**(budget or {}))
+        runner = _CrawlerRunner(self._settings())
+        d = runner.crawl(_RelatedSpider, self._requests_params,
+                         client=client, storage_options=storage_options,
+                         max_depth=max_depth, vocabulary=keywords_path,
+                         capacity=capacity, budget=crawl_budget,
+                         **self._namespace)
+        d.addBoth(lambda _: _reactor.stop())
+        _reactor.run()
+        return crawl_budget.report()
+
+    def control(self, client: _MongoClient, command: str, spider: str = None,
+                **args):
+        """
+        Envia um comando a uma coleta em curso, em outro processo.
+
+        Parameters
+        ----------
+        client : MongoClient
+            Cliente do MongoDB da coleta.
+        command : str
+            "pause", "resume", "throttle", "inject", "flush" ou "stop" (ver
+            QControl.send_command).
+        spider : str, optional
+            name da spider destinatária. The default is None, qualquer spider.
+        **args
+            Argumentos do comando, por exemplo concurrency=2, delay=1.0 no
+            "throttle" ou pairs=[["category", "query"]] no "inject".
+
+        Returns
+        -------
+        ObjectId
+            Identificação do comando na coleção control.
+
+        """
+        return _send_command(self.namespace(client), command, spider, **args)
+
+    def reprocess(self, uri: str, database: str, prefix: str = "",
+                  processes: int = None, storage_options: dict = None):
+        """
+        Reprocessa as respostas do archive_dir em um banco novo, sem rede.
+
+        Parameters
+        ----------
+        uri : str
+            URI do MongoDB; cada processo abre o seu cliente.
+        database : str
+            Banco de dados de destino.
+        prefix : str, optional
+            Prefixo das coleções de destino. The default is "".
+        processes : int, optional
+            Processos de reprocessamento. The default is None, um por CPU.
+        storage_options : dict, optional
+            Opções da camada de persistência, como no run. The default is
+            None.
+
+        Raises
+        ------
+        ValueError
+            Erro caso o archive_dir não tenha sido definido.
+
+        Returns
+        -------
+        dict
+            Quantidade de respostas reprocessadas por spider.
+
+        """
+        if self._archive_dir is None:
+            raise ValueError("Especifique o archive_dir corretamente.")
+        return _reprocess(self._archive_dir, uri, self._requests_params,
+                          database, prefix, processes, storage_options)
+
 
 if __name__ == "__main__":
     from os import sep as _os_sep
@@ -0,0 +1,7 @@
+"""Configuração dos testes: os módulos do QScraper ficam em venvpost."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
@@ -0,0 +1,78 @@
+"""Testes do reprocessamento do arquivo de respostas (QArchive)."""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("scrapy")
+
+import pymongo  # noqa: E402
+import QArchive  # noqa: E402
+import QScraper  # noqa: E402
+from scrapy.http import Request  # noqa: E402
+from scrapy.http import TextResponse  # noqa: E402
+from scrapy.utils.test import get_crawler  # noqa: E402
+
+PARAMS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), "etc", "requests_params_answers.json")
+
+
+def _params():
+    with open(PARAMS) as f:
+        params = json.load(f)
+    params["user-agent"] = {"user": "test"}
+    return params
+
+
+def _search_page(after):
+    edges = [{"node": {"searchResultType": "question",
+                       "question": {"qid": after + 10 + i,
+                                    "url": f"/q{after + 10 + i}"}}}
+             for i in range(2)]
+    return {"data": {"searchConnection": {
+        "edges": edges, "pageInfo": {"hasNextPage": after < 9}}}}
+
+
+def _crawl(client, directory, pairs, **kwargs):
+    """Coleta os pares com respostas fixas, arquivando as respostas."""
+    crawler = get_crawler(QScraper.SearchSpider)
+    spider = QScraper.SearchSpider.from_crawler(crawler, pairs, _params(),
+                                                client=client, **kwargs)
+    archive = QArchive.ArchiveMiddleware(QArchive.ArchiveWriter(directory))
+    crawler.signals.connect(archive.fanout, QArchive.category_fanout)
+    requests = list(spider.start_requests())
+    while requests:
+        request = requests.pop(0)
+        after = int(json.loads(request.body)["variables"]["after"])
+        response = TextResponse(request.url, request=request,
+                                body=json.dumps(_search_page(after)).encode(),
+                                encoding="utf-8")
+        archive.process_response(request, response, spider)
+        requests.extend(r for r in request.callback(
+            response, **request.cb_kwargs) or () if isinstance(r, Request))
+    spider.closed("finished")
+    archive.spider_closed(spider)
+
+
+def _relations(db):
+    return sorted(doc["_id"] for doc in db["category_query_qid"].find())
+
+
+def test_reprocess_rebuilds_fresh_skip_fanout(tmp_path, monkeypatch):
+    monkeypatch.setattr(QScraper, "MongoClient", mongomock.MongoClient)
+    client = mongomock.MongoClient()
+    _crawl(client, str(tmp_path), [("a", "hiv")])
+    # a query ainda é válida: a nova category recebe os resultados gravados
+    _crawl(client, str(tmp_path), [("b", "hiv")], fresh_ttl=3600)
+    live = _relations(client["quora_database"])
+    assert "b_hiv_10" in live
+
+    replay = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, "MongoClient", lambda uri: replay)
+    monkeypatch.setattr(QArchive, "ProcessPoolExecutor", ThreadPoolExecutor)
+    QArchive.reprocess(str(tmp_path), "mongodb://test", _params(),
+                       "quora_reprocess", processes=1)
+    assert _relations(replay["quora_reprocess"]) == live
@@ -0,0 +1,29 @@
+"""Testes das fontes de palavras-chave (QKeywords)."""
+
+import json
+
+from QKeywords import keyword_pairs
+
+
+def test_csv_skips_malformed_rows(tmp_path):
+    path = tmp_path / "keywords.csv"
+    path.write_text("category,query\nSaude,HIV\nsozinha\n\nsaude, aids \n",
+                    encoding="utf-8")
+    assert list(keyword_pairs(str(path))) == [("saude", "hiv"),
+                                               ("saude", "aids")]
+
+
+def test_sources_normalize_alike(tmp_path):
+    rows = [(" Saude", "HIV "), ("saude ", " Aids")]
+    csv_path = tmp_path / "keywords.csv"
+    csv_path.write_text("".join(f"{c},{q}\n" for c, q in rows),
+                        encoding="utf-8")
+    jsonl_path = tmp_path / "keywords.jsonl"
+    jsonl_path.write_text("".join(json.dumps({"category": c, "query": q})
+                                  + "\n" for c, q in rows), encoding="utf-8")
+
+    expected = [("saude", "hiv"), ("saude", "aids")]
+    assert list(keyword_pairs(str(csv_path))) == expected
+    assert list(keyword_pairs(str(jsonl_path))) == expected
+    assert list(keyword_pairs(rows)) == expected
+    assert list(keyword_pairs({" Saude": ["HIV ", " Aids"]})) == expected
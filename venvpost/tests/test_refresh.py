@@ -0,0 +1,64 @@
+"""Testes da revisita orçada (QScrapeRunner.refresh)."""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("scrapy")
+
+import Runner  # noqa: E402
+from scrapy.utils.test import get_crawler  # noqa: E402
+from twisted.internet import defer  # noqa: E402
+
+PARAMS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), "etc", "requests_params_answers.json")
+
+
+class _Runner:
+    """CrawlerRunner que apenas guarda as spiders pedidas."""
+
+    crawls = []
+
+    def __init__(self, settings):
+        pass
+
+    def crawl(self, spidercls, *args, **kwargs):
+        self.crawls.append((spidercls, args, kwargs))
+        return defer.succeed(None)
+
+
+class _Reactor:
+
+    def run(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def test_refresh_stops_at_budget(monkeypatch):
+    monkeypatch.setattr(Runner, "_CrawlerRunner", _Runner)
+    monkeypatch.setattr(Runner, "_reactor", _Reactor())
+    _Runner.crawls.clear()
+
+    client = mongomock.MongoClient()
+    db = client["quora_database"]
+    last_visit = datetime.utcnow() - timedelta(days=7)
+    db["revisits"].insert_many([
+        {"_id": qid, "last_visit": last_visit, "answers": 5,
+         "history": [{"t": last_visit, "answers": 5}],
+         "category": "saude", "query": "hiv"} for qid in range(1, 6)])
+    # perguntas que ficaram na fila de execuções anteriores
+    db["tmp"].insert_many([{"_id": qid, "category": "saude", "query": "hiv"}
+                           for qid in range(100, 110)])
+
+    runner = Runner.QScrapeRunner("user", "user@example.com", PARAMS)
+    runner.refresh(client, budget=3)
+
+    [(spidercls, args, kwargs)] = _Runner.crawls
+    spider = spidercls.from_crawler(get_crawler(spidercls), *args, **kwargs)
+    requests = list(spider.start_requests())
+    assert len(requests) == 3
+    assert spider.budget.exhausted() == "max_requests"
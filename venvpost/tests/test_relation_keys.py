@@ -0,0 +1,81 @@
+"""Testes dos esquemas de chaves das relações (QStorage.RelationKeys)."""
+
+import pytest
+
+from QStorage import RelationKeys
+
+mongomock = pytest.importorskip("mongomock")
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient()["quora_test"]
+    db["category_query"].insert_one({"_id": "a_hiv_aids", "category": "a",
+                                     "query": "hiv_aids"})
+    return db
+
+
+@pytest.mark.parametrize("scheme", RelationKeys.schemes)
+def test_category_query_entity_round_trip(db, scheme):
+    keys = RelationKeys(db, scheme)
+    doc = keys.category_query_entity("a", "hiv_aids", "qid", 123456)
+    assert keys.unpack_category_query_entity(doc["_id"], "qid") == (
+        "a", "hiv_aids", 123456)
+    assert doc["qid"] == 123456
+
+
+@pytest.mark.parametrize("scheme", RelationKeys.schemes)
+def test_question_answer_round_trip(db, scheme):
+    keys = RelationKeys(db, scheme)
+    doc = keys.question_answer(2 ** 31 - 1, 2 ** 32 - 1)
+    assert keys.unpack_question_answer(doc["_id"]) == (2 ** 31 - 1,
+                                                       2 ** 32 - 1)
+
+
+def test_int64_packs_integers(db):
+    keys = RelationKeys(db, "int64")
+    assert isinstance(keys.category_query_entity(
+        "a", "hiv_aids", "qid", 7)["_id"], int)
+    assert isinstance(keys.question_answer(1, 2)["_id"], int)
+    assert isinstance(keys.category_query("a", "hiv_aids"), int)
+    assert keys.fallbacks == 0
+
+
+def test_int64_falls_back_to_compound(db):
+    keys = RelationKeys(db, "int64")
+    doc = keys.category_query_entity("a", "hiv_aids", "qid", 2 ** 32)
+    assert doc["_id"] == {"c": doc["category"], "q": doc["query"],
+                          "qid": 2 ** 32}
+    assert keys.unpack_category_query_entity(doc["_id"], "qid") == (
+        "a", "hiv_aids", 2 ** 32)
+
+    doc = keys.question_answer(2 ** 31, 5)
+    assert doc["_id"] == {"qid": 2 ** 31, "aid": 5}
+    assert keys.unpack_question_answer(doc["_id"]) == (2 ** 31, 5)
+    assert keys.fallbacks == 2
+
+
+def test_int64_category_overflow_falls_back(db):
+    keys = RelationKeys(db, "int64")
+    db["counters"].insert_one({"_id": "category", "seq": 2 ** 7})
+    doc = keys.category_query_entity("b", "hiv_aids", "qid", 9)
+    assert isinstance(doc["_id"], dict)
+    assert keys.category_query("b", "hiv_aids") == {"c": 2 ** 7 + 1,
+                                                    "q": doc["query"]}
+    assert keys.unpack_category_query_entity(doc["_id"], "qid") == (
+        "b", "hiv_aids", 9)
+
+
+def test_filter_matches_both_key_forms(db):
+    keys = RelationKeys(db, "int64")
+    small = keys.category_query_entity("a", "hiv_aids", "qid", 1)
+    large = keys.category_query_entity("a", "hiv_aids", "qid", 2 ** 40)
+    db["category_query_qid"].insert_many([small, large])
+    found = db["category_query_qid"].find(
+        keys.category_query_filter("a", "hiv_aids"))
+    assert sorted(doc["qid"] for doc in found) == [1, 2 ** 40]
+
+
+def test_unknown_scheme():
+    with pytest.raises(ValueError):
+        RelationKeys(None, "uuid")